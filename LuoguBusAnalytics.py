@@ -0,0 +1,259 @@
+import json
+import math
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+
+
+AC_STATUS = 12
+# 运行时间（毫秒）和内存（KB）分布的分段边界
+TIME_EDGES = (0, 10, 50, 100, 200, 500, 1000, 2000)
+MEMORY_EDGES = (0, 1024, 4096, 16384, 65536, 131072, 262144, 524288)
+PERCENTILES = (50, 90, 99)
+
+
+def utc_offset(timestamp):
+    """本地时区在该时刻相对UTC的偏移（秒）"""
+    return int(datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds())
+
+
+def local_days(timestamps):
+    """时间戳转换为本地日期序号（自1970-01-01起的天数）；时区偏移按小时缓存，夏令时切换也能正确处理"""
+    offsets = {}
+    days = []
+    for timestamp in timestamps:
+        hour = timestamp // 3600
+        offset = offsets.get(hour)
+        if offset is None:
+            offset = offsets[hour] = utc_offset(hour * 3600)
+        days.append((timestamp + offset) // 86400)
+    return days
+
+
+def day_text(day):
+    return time.strftime("%Y-%m-%d", time.gmtime(int(day) * 86400))
+
+
+def week_start(day):
+    """日期序号所在周（周一开始）的周一；1970-01-01 是周四"""
+    return (day + 3) // 7 * 7 - 3
+
+
+def percentile(sorted_values, q):
+    """线性插值百分位数，与 numpy.percentile 的默认算法一致"""
+    position = (len(sorted_values) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def bucket_labels(edges, unit):
+    labels = [f"{low}-{high}{unit}" for low, high in zip(edges, edges[1:])]
+    return labels + [f"≥{edges[-1]}{unit}"]
+
+
+def distribution(maximum, percentiles, counts, edges, unit):
+    """分布摘要：百分位数、最大值和各分段计数"""
+    return {
+        "count": int(sum(counts)),
+        **{f"p{q}": round(float(value), 1) for q, value in zip(PERCENTILES, percentiles)},
+        "max": int(maximum) if maximum is not None else None,
+        "histogram": [{"range": label, "count": int(count)} for label, count in zip(bucket_labels(edges, unit), counts)],
+    }
+
+
+def streaks(active_days, today):
+    """(最长连续天数, 当前连续天数)；最后一次提交不是今天或昨天时当前连续天数为0"""
+    longest = current = 0
+    previous = None
+    for day in active_days:
+        current = current + 1 if previous is not None and day == previous + 1 else 1
+        longest = max(longest, current)
+        previous = day
+    if previous is None or previous < today - 1:
+        current = 0
+    return longest, current
+
+
+# 训练数据统计：逐行收集为紧凑的列式数组，结束时一次性计算（安装了 NumPy 时使用向量化计算）
+class TrainingAnalytics:
+    def __init__(self):
+        self.submit_times = array("q")
+        self.statuses = array("i")
+        self.run_times = array("q")
+        self.memories = array("q")
+        self.problem_ids = array("i")
+        self.pids = {}  # 题号 -> 编号
+        self.titles = []
+
+    def write(self, row):
+        index = self.pids.get(row.pid)
+        if index is None:
+            index = self.pids[row.pid] = len(self.titles)
+            self.titles.append(row.title)
+        self.problem_ids.append(index)
+        self.submit_times.append(row.submit_time)
+        self.statuses.append(row.status_code if row.status_code is not None else -1)
+        self.run_times.append(row.time or 0)
+        self.memories.append(row.memory or 0)
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self.submit_times)
+
+    def summary(self):
+        """计算统计摘要（可直接序列化为JSON）"""
+        if not len(self):
+            return {"total": 0}
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        parts = self.compute_numpy(numpy) if numpy is not None else self.compute_python()
+
+        pid_names = list(self.pids)
+        total = len(self)
+        accepted = parts["accepted"]
+        longest, current = streaks(parts["active_days"], local_days([int(time.time())])[0])
+        return {
+            "total": total,
+            "accepted": accepted,
+            "ac_rate": round(accepted / total, 4),
+            "problems_attempted": len(pid_names),
+            "problems_solved": sum(1 for value in parts["first_ac"] if value is not None),
+            "first_submit": min(self.submit_times),
+            "last_submit": max(self.submit_times),
+            "active_days": len(parts["active_days"]),
+            "longest_streak": longest,
+            "current_streak": current,
+            "daily": [{"date": day_text(day), "submissions": count, "accepted": ac}
+                      for day, count, ac in parts["daily"]],
+            "weekly": [{"week_start": day_text(day), "submissions": count, "accepted": ac}
+                       for day, count, ac in parts["weekly"]],
+            "problems": [{
+                "pid": pid_names[index],
+                "title": self.titles[index],
+                "attempts": attempts,
+                "attempts_before_ac": before,
+                "first_ac": day_text(first_ac) if first_ac is not None else None,
+            } for index, (attempts, before, first_ac) in enumerate(zip(parts["attempts"], parts["before_ac"],
+                                                                         parts["first_ac"]))],
+            "time_ms": parts["time_ms"],
+            "memory_kb": parts["memory_kb"],
+        }
+
+    def compute_python(self):
+        """纯 Python 实现，没有安装 NumPy 时使用"""
+        days = local_days(self.submit_times)
+        accepted_flags = [status == AC_STATUS for status in self.statuses]
+
+        daily = Counter(days)
+        daily_ac = Counter(day for day, ac in zip(days, accepted_flags) if ac)
+        weekly = Counter(week_start(day) for day in days)
+        weekly_ac = Counter(week_start(day) for day, ac in zip(days, accepted_flags) if ac)
+
+        # 每道题按提交时间排序，第一次AC之前的提交次数
+        problem_count = len(self.titles)
+        attempts = [0] * problem_count
+        before_ac = [None] * problem_count
+        first_ac = [None] * problem_count
+        order = sorted(range(len(days)), key=lambda i: (self.problem_ids[i], self.submit_times[i]))
+        for i in order:
+            problem = self.problem_ids[i]
+            if accepted_flags[i] and before_ac[problem] is None:
+                before_ac[problem] = attempts[problem]
+                first_ac[problem] = days[i]
+            attempts[problem] += 1
+
+        accepted_times = sorted(t for t, ac in zip(self.run_times, accepted_flags) if ac)
+        accepted_memories = sorted(m for m, ac in zip(self.memories, accepted_flags) if ac)
+
+        def describe(values, edges, unit):
+            counts = [0] * len(edges)
+            for value in values:
+                counts[bisect_right(edges, value) - 1 if value >= edges[0] else 0] += 1
+            return distribution(values[-1] if values else None,
+                                [percentile(values, q) for q in PERCENTILES] if values else [0] * len(PERCENTILES),
+                                counts, edges, unit)
+
+        return {
+            "accepted": sum(accepted_flags),
+            "active_days": sorted(daily),
+            "daily": [(day, daily[day], daily_ac[day]) for day in sorted(daily)],
+            "weekly": [(week, weekly[week], weekly_ac[week]) for week in sorted(weekly)],
+            "attempts": attempts,
+            "before_ac": before_ac,
+            "first_ac": first_ac,
+            "time_ms": describe(accepted_times, TIME_EDGES, "ms"),
+            "memory_kb": describe(accepted_memories, MEMORY_EDGES, "KB"),
+        }
+
+    def compute_numpy(self, np):
+        """NumPy 向量化实现：十万条记录也只需几十毫秒"""
+        submit_times = np.frombuffer(self.submit_times, dtype=np.int64)
+        statuses = np.frombuffer(self.statuses, dtype=np.int32)
+        problems = np.frombuffer(self.problem_ids, dtype=np.int32)
+        accepted_flags = statuses == AC_STATUS
+
+        # 本地日期：只对出现过的小时计算一次时区偏移
+        hours, hour_index = np.unique(submit_times // 3600, return_inverse=True)
+        offsets = np.array([utc_offset(int(hour) * 3600) for hour in hours], dtype=np.int64)
+        days = (submit_times + offsets[hour_index]) // 86400
+
+        def grouped(keys):
+            unique, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse)
+            ac_counts = np.bincount(inverse, weights=accepted_flags).astype(np.int64)
+            return [(int(key), int(count), int(ac)) for key, count, ac in zip(unique, counts, ac_counts)]
+
+        daily = grouped(days)
+        weekly = grouped((days + 3) // 7 * 7 - 3)
+
+        # 按 (题目, 提交时间) 排序后，每组内第一次AC的位置就是之前的提交次数
+        problem_count = len(self.titles)
+        order = np.lexsort((submit_times, problems))
+        sorted_problems = problems[order]
+        attempts = np.bincount(sorted_problems, minlength=problem_count)
+        starts = np.concatenate(([0], np.cumsum(attempts)[:-1]))
+        positions = np.arange(len(order)) - starts[sorted_problems]
+        missing = len(order) + 1
+        first_positions = np.full(problem_count, missing)
+        ac_sorted = accepted_flags[order]
+        np.minimum.at(first_positions, sorted_problems[ac_sorted], positions[ac_sorted])
+        solved = first_positions < missing
+        first_ac_days = days[order][np.where(solved, starts + first_positions, starts)]
+
+        def describe(values, edges, unit):
+            if not len(values):
+                return distribution(None, [0] * len(PERCENTILES), [0] * len(edges), edges, unit)
+            buckets = np.searchsorted(np.array(edges[1:]), values, side="right")
+            return distribution(values.max(), np.percentile(values, PERCENTILES),
+                                np.bincount(buckets, minlength=len(edges)).tolist(), edges, unit)
+
+        return {
+            "accepted": int(accepted_flags.sum()),
+            "active_days": [day for day, _, _ in daily],
+            "daily": daily,
+            "weekly": weekly,
+            "attempts": attempts.tolist(),
+            "before_ac": [int(position) if ok else None for position, ok in zip(first_positions, solved)],
+            "first_ac": [int(day) if ok else None for day, ok in zip(first_ac_days, solved)],
+            "time_ms": describe(np.frombuffer(self.run_times, dtype=np.int64)[accepted_flags], TIME_EDGES, "ms"),
+            "memory_kb": describe(np.frombuffer(self.memories, dtype=np.int64)[accepted_flags], MEMORY_EDGES, "KB"),
+        }
+
+
+# 统计摘要导出为JSON文件，可作为一种导出格式与其他格式一起生成
+class SummaryJsonWriter(TrainingAnalytics):
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+
+    def close(self):
+        with open(self.filename, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        print(f"✓ 已生成统计摘要: {self.filename}")
@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import LuoguBusHttp
+from LuoguBusExport import export_diary, format_filename
+from LuoguBusHttp import TokenBucket
+from LuoguBusMain import fetch_luogu_submissions, iter_luogu_submissions
+from LuoguBusRecord import STATUS_TABLE, Submission
+
+
+def synthetic_record(index, base_time=1700000000):
+    """第 index 条（从旧到新）合成提交记录，同样的 index 总是生成同样的记录"""
+    rng = random.Random(index)
+    problem = 1000 + rng.randrange(500)
+    return {
+        "id": 10000000 + index,
+        "submitTime": base_time + index * 60 + rng.randrange(60),
+        "problem": {"pid": f"P{problem}", "title": f"模拟题目 {problem}", "difficulty": problem % 8, "type": "P"},
+        "status": rng.choice(list(STATUS_TABLE)),
+        "time": rng.randrange(1000),
+        "memory": rng.randrange(1 << 16),
+        "language": 28,
+        "score": rng.randrange(101),
+    }
+
+
+# 本地模拟的洛谷 /record/list 接口：按页返回合成记录，可配置延迟、错误率和每页条数
+class MockLuoguServer:
+    def __init__(self, total=1000, page_size=20, latency=0.0, error_rate=0.0):
+        self.total = total
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def page(self, page):
+        """第 page 页（从新到旧）的记录"""
+        newest = self.total - 1 - (page - 1) * self.page_size
+        oldest = max(-1, newest - self.page_size)
+        return [synthetic_record(index) for index in range(newest, oldest, -1)]
+
+    def handle(self, request):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            request.send_response(503)
+            request.send_header("Retry-After", "0")
+            request.end_headers()
+            return
+
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        if url.path == "/record/list":
+            page = int(query.get("page", ["1"])[0])
+            body = {"code": 200, "currentData": {"records": {
+                "result": self.page(page), "count": self.total, "perPage": self.page_size,
+            }}}
+        else:
+            request.send_response(404)
+            request.end_headers()
+            return
+
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            self.bytes_sent += len(data)
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+
+def measure(func, memory=True):
+    """运行 func，返回 (结果, 耗时秒数, 峰值内存KB)；memory 为真时额外用 tracemalloc 再跑一次测峰值内存"""
+    # 被测函数的进度输出不计入结果
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        peak_kb = None
+        if memory:
+            tracemalloc.start()
+            func()
+            peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+    return result, seconds, peak_kb
+
+
+def bench_fetch(sizes, args):
+    results = []
+    for size in sizes:
+        with MockLuoguServer(size, args.page_size, args.latency, args.error_rate) as server:
+            LuoguBusHttp.LUOGU_BASE_URL = server.url
+            for name, fetch in (("fetch", fetch_luogu_submissions), ("fetch_stream", iter_luogu_submissions)):
+                def run():
+                    limiter = TokenBucket(rate=args.rate)
+                    return sum(1 for _ in fetch("1", "bench", size, workers=args.workers, limiter=limiter))
+
+                server.requests = server.bytes_sent = 0
+                count, seconds, peak_kb = measure(run, args.memory)
+                runs = 2 if args.memory else 1
+                results.append({
+                    "bench": name,
+                    "records": count,
+                    "seconds": round(seconds, 4),
+                    "records_per_sec": round(count / seconds, 1) if seconds else None,
+                    "requests": server.requests // runs,
+                    "bytes": server.bytes_sent // runs,
+                    "peak_mem_kb": peak_kb,
+                })
+                print(f"{name:>14} {size:>7} 条: {seconds:8.3f} 秒, {results[-1]['requests']} 次请求")
+    return results
+
+
+def bench_export(sizes, formats, args):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            records = [Submission.from_json(synthetic_record(index)) for index in range(size)]
+            for name in formats:
+                base_filename = os.path.join(directory, f"bench_{size}")
+
+                def run():
+                    return export_diary(records, base_filename, [name])["count"]
+
+                count, seconds, peak_kb = measure(run, args.memory)
+                filename = format_filename(base_filename, name)
+                size_bytes = os.path.getsize(filename) if os.path.exists(filename) else None
+                results.append({
+                    "bench": f"export_{name}",
+                    "records": count,
+                    "seconds": round(seconds, 4),
+                    "rows_per_sec": round(count / seconds, 1) if seconds else None,
+                    "file_bytes": size_bytes,
+                    "peak_mem_kb": peak_kb,
+                })
+                print(f"{'export_' + name:>14} {size:>7} 条: {seconds:8.3f} 秒")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="洛谷刷题日记生成器性能测试（使用本地模拟服务器，无需洛谷账号）")
+    parser.add_argument("--fetch-sizes", default="50,1000,10000", help="抓取测试的记录条数，逗号分隔")
+    parser.add_argument("--export-sizes", default="50,1000,10000,100000", help="导出测试的记录条数，逗号分隔")
+    parser.add_argument("--formats", default="xlsx,csv,csv.gz,ndjson.gz", help="参与测试的导出格式")
+    parser.add_argument("--page-size", type=int, default=20, help="模拟服务器每页条数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器每次请求的延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务器返回503的概率")
+    parser.add_argument("--rate", type=float, default=1000.0, help="测试时的请求频率上限（次/秒）")
+    parser.add_argument("--workers", type=int, default=4, help="并发请求数")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="不测量峰值内存（更快）")
+    parser.add_argument("--output", default="bench_output.json", help="结果输出文件（JSON）")
+    args = parser.parse_args()
+
+    def sizes(text):
+        return [int(value) for value in text.split(",") if value.strip()]
+
+    formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    # 模拟服务器的重试无需等待太久
+    LuoguBusHttp.BACKOFF_BASE = 0.01
+
+    results = bench_fetch(sizes(args.fetch_sizes), args) + bench_export(sizes(args.export_sizes), formats, args)
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ 测试结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import base64
+import configparser
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from LuoguBusCookies import platform_key
+
+
+# Linux 上各浏览器保存在系统密钥环中的密码条目（v11 前缀的 Cookie 使用）
+LINUX_KEYRING_LABELS = {
+    "Chrome": "Chrome Safe Storage",
+    "Chromium": "Chromium Safe Storage",
+    "Edge": "Microsoft Edge Safe Storage",
+    "Brave": "Brave Safe Storage",
+}
+# Linux 上没有接入密钥环时 Chromium 使用的固定密码（v10 前缀的 Cookie 使用）
+LINUX_DEFAULT_PASSWORD = b"peanuts"
+
+COOKIE_SQL = """
+    SELECT host_key, name, value, encrypted_value, expires_utc
+    FROM cookies
+    WHERE host_key = ? OR host_key LIKE ?
+"""
+# Chromium 的时间戳从1601年1月1日起算（微秒）
+CHROMIUM_EPOCH_OFFSET = 11644473600
+
+
+def read_cookie_db(path, read):
+    """只读打开浏览器的Cookie数据库，执行 read(conn) 并返回其结果
+
+    一般不复制文件，直接只读打开（immutable=1：不加锁，也不读写日志文件）；有 -wal 日志文件时
+    （Firefox 等使用 WAL 模式，运行中的浏览器刚写入的Cookie还在日志里）不能用 immutable，否则读不到这部分内容。
+    打开或查询出错时（如 Windows 上运行中的浏览器独占锁定文件），把数据库连同 -wal 日志复制到临时目录再读取
+    """
+    path = Path(path)
+    wal_path = Path(f"{path}-wal")
+    options = "mode=ro" if wal_path.is_file() and wal_path.stat().st_size else "mode=ro&immutable=1"
+    try:
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?{options}", uri=True)
+        try:
+            return read(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_path = os.path.join(temp_dir, path.name)
+        shutil.copyfile(path, temp_path)
+        # 只复制 -wal 日志，不复制 -shm：打开时 SQLite 按日志重建共享内存索引，不会用到浏览器进程中途的状态
+        if wal_path.is_file():
+            shutil.copyfile(wal_path, f"{temp_path}-wal")
+        conn = sqlite3.connect(temp_path)
+        try:
+            return read(conn)
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def dpapi_decrypt(data):
+    """用 Windows DPAPI 解密（只能解密当前用户加密的数据）"""
+    import ctypes
+    import ctypes.wintypes
+
+    class DATA_BLOB(ctypes.Structure):
+        _fields_ = [("cbData", ctypes.wintypes.DWORD),
+                    ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+    blob = DATA_BLOB()
+    blob.cbData = len(data)
+    blob.pbData = ctypes.cast(ctypes.create_string_buffer(data), ctypes.POINTER(ctypes.c_char))
+
+    ctypes.windll.crypt32.CryptUnprotectData.restype = ctypes.c_int
+    ctypes.windll.crypt32.CryptUnprotectData.argtypes = [
+        ctypes.POINTER(DATA_BLOB), ctypes.c_wchar_p,
+        ctypes.POINTER(DATA_BLOB), ctypes.c_void_p,
+        ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(DATA_BLOB)
+    ]
+
+    out_blob = DATA_BLOB()
+    result = ctypes.windll.crypt32.CryptUnprotectData(
+        ctypes.byref(blob), None, None, None, None, 0, ctypes.byref(out_blob)
+    )
+    if not result:
+        raise OSError("DPAPI解密失败")
+    return ctypes.string_at(out_blob.pbData, out_blob.cbData)
+
+
+def linux_key(password):
+    """Linux 上 Chromium 的 Cookie 密钥：PBKDF2-SHA1(密码, "saltysalt", 1次迭代)，AES-128"""
+    return hashlib.pbkdf2_hmac("sha1", password, b"saltysalt", 1, 16)
+
+
+def linux_keyring_password(browser):
+    """从系统密钥环（Secret Service）读取浏览器的加密密码，需要可选依赖 secretstorage"""
+    label = LINUX_KEYRING_LABELS.get(browser)
+    try:
+        import secretstorage
+    except ImportError:
+        return None
+    try:
+        connection = secretstorage.dbus_init()
+        for item in secretstorage.get_default_collection(connection).get_all_items():
+            if item.get_label() == label:
+                return item.get_secret()
+    except Exception:
+        return None
+    return None
+
+
+# Cookie值解密器：密钥和加密算法对象只创建一次，所有Cookie共用
+class GcmDecryptor:
+    """AES-256-GCM（Windows 上 v10/v11 前缀）：12字节 nonce + 密文 + 16字节认证标签"""
+
+    def __init__(self, key):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        self.aead = AESGCM(key)
+
+    def decrypt(self, data):
+        return self.aead.decrypt(data[:12], data[12:], None)
+
+
+class CbcDecryptor:
+    """AES-128-CBC（Linux 上 v10/v11 前缀），IV 固定为16个空格"""
+
+    def __init__(self, key):
+        from cryptography.hazmat.primitives import padding
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        self.cipher = Cipher(algorithms.AES(key), modes.CBC(b" " * 16))
+        self.padding = padding.PKCS7(128)
+
+    def decrypt(self, data):
+        decryptor = self.cipher.decryptor()
+        padded = decryptor.update(data) + decryptor.finalize()
+        unpadder = self.padding.unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+
+
+# Chromium 系浏览器（Chrome/Edge/Brave/Chromium）：按 Local State 记录的配置文件定位Cookie数据库
+class ChromiumCookies:
+    def __init__(self, user_data_dir, name="Chrome", platform=None, key=None):
+        self.user_data_dir = Path(user_data_dir)
+        self.name = name
+        self.platform = platform or platform_key()
+        self._key = key  # 可直接传入密钥（测试用的Cookie数据库）
+        self._decryptor = None
+        self._keyring_decryptor = None
+        self._local_state = None
+
+    def local_state(self):
+        if self._local_state is None:
+            try:
+                with open(self.user_data_dir / "Local State", encoding="utf-8") as f:
+                    self._local_state = json.load(f)
+            except (OSError, ValueError):
+                self._local_state = {}
+        return self._local_state
+
+    def profiles(self):
+        """配置文件目录，最近使用的排在最前；没有 Local State 时按默认布局查找（Default、Profile N）"""
+        profile = self.local_state().get("profile", {})
+        names = list(profile.get("info_cache", {}))
+        last_used = profile.get("last_used")
+        if last_used:
+            names = [last_used] + [name for name in names if name != last_used]
+        if not names:
+            names = ["Default"]
+            try:
+                names += sorted(entry.name for entry in os.scandir(self.user_data_dir)
+                                if entry.is_dir() and entry.name.startswith("Profile "))
+            except OSError:
+                pass
+        return [self.user_data_dir / name for name in names]
+
+    def cookie_files(self):
+        files = []
+        for profile in self.profiles():
+            # Chrome 96 起Cookie数据库移到了 Network 子目录
+            for path in (profile / "Network" / "Cookies", profile / "Cookies"):
+                if path.is_file():
+                    files.append(path)
+                    break
+        return files
+
+    def key(self):
+        """解密密钥：Windows 为 Local State 中经 DPAPI 保护的 AES-256 密钥，Linux 为固定密码派生的 AES-128 密钥"""
+        if self._key is None:
+            if self.platform == "win32":
+                encrypted_key = base64.b64decode(self.local_state()["os_crypt"]["encrypted_key"])
+                self._key = dpapi_decrypt(encrypted_key[5:])  # 移除 "DPAPI" 前缀
+            else:
+                self._key = linux_key(LINUX_DEFAULT_PASSWORD)
+        return self._key
+
+    def decryptor(self):
+        if self._decryptor is None:
+            self._decryptor = GcmDecryptor(self.key()) if self.platform == "win32" else CbcDecryptor(self.key())
+        return self._decryptor
+
+    def keyring_decryptor(self):
+        """Linux 上 v11 前缀使用密钥环中的密码；读取不到时返回 None（只查询一次）"""
+        if self._keyring_decryptor is None:
+            password = linux_keyring_password(self.name)
+            self._keyring_decryptor = CbcDecryptor(linux_key(password)) if password else False
+        return self._keyring_decryptor or None
+
+    def decrypt(self, encrypted_value, host_key, meta_version=0):
+        """解密一个Cookie值，无法解密时返回 None"""
+        prefix = encrypted_value[:3]
+        if self.platform == "win32":
+            if prefix not in (b"v10", b"v11"):
+                return None  # v20 等应用绑定加密无法在浏览器外解密
+            value = self.decryptor().decrypt(encrypted_value[3:])
+        elif prefix == b"v10":
+            value = self.decryptor().decrypt(encrypted_value[3:])
+        elif prefix == b"v11" and self.keyring_decryptor():
+            value = self.keyring_decryptor().decrypt(encrypted_value[3:])
+        else:
+            return None
+        # 数据库版本 24 起，明文前加了 host_key 的 SHA256 摘要
+        if meta_version >= 24 and value[:32] == hashlib.sha256(host_key.encode("utf-8")).digest():
+            value = value[32:]
+        return value.decode("utf-8")
+
+    def iter_cookies(self, domain):
+        """逐个配置文件产出 (Cookie字典, {名称: 过期时间戳或None})"""
+        def read(conn):
+            rows = conn.execute(COOKIE_SQL, (domain, f"%.{domain}")).fetchall()
+            try:
+                meta_version = int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+            except (sqlite3.Error, TypeError, ValueError):
+                meta_version = 0
+            return rows, meta_version
+
+        for path in self.cookie_files():
+            rows, meta_version = read_cookie_db(path, read)
+
+            cookies = {}
+            expires = {}
+            for host_key, name, value, encrypted_value, expires_utc in rows:
+                if not value and encrypted_value:
+                    try:
+                        value = self.decrypt(encrypted_value, host_key, meta_version)
+                    except Exception as e:
+                        print(f"解密 {self.name} Cookie {name} 失败: {str(e)}")
+                        continue
+                if value:
+                    cookies[name] = value
+                    expires[name] = expires_utc / 1000000 - CHROMIUM_EPOCH_OFFSET if expires_utc else None
+            yield cookies, expires
+
+
+# Firefox：按 profiles.ini 定位配置目录，Cookie 以明文保存在 cookies.sqlite 中
+class FirefoxCookies:
+    def __init__(self, root, name="Firefox"):
+        self.root = Path(root)
+        self.name = name
+
+    def profiles(self):
+        """配置目录，安装默认使用的（Install 段）和标记为 Default=1 的排在最前"""
+        parser = configparser.ConfigParser(interpolation=None)
+        try:
+            parser.read(self.root / "profiles.ini", encoding="utf-8")
+        except configparser.Error:
+            return []
+        preferred = []
+        others = []
+        for section in parser.sections():
+            if section.startswith("Install") and parser.has_option(section, "Default"):
+                preferred.append(self.root / parser.get(section, "Default"))
+            elif section.startswith("Profile") and parser.has_option(section, "Path"):
+                path = parser.get(section, "Path")
+                path = self.root / path if parser.get(section, "IsRelative", fallback="1") == "1" else Path(path)
+                (preferred if parser.get(section, "Default", fallback="0") == "1" else others).append(path)
+        return list(dict.fromkeys(preferred + others))
+
+    def iter_cookies(self, domain):
+        """逐个配置目录产出 (Cookie字典, {名称: 过期时间戳或None})"""
+        for profile in self.profiles():
+            path = profile / "cookies.sqlite"
+            if not path.is_file():
+                continue
+            rows = read_cookie_db(path, lambda conn: conn.execute(
+                "SELECT name, value, expiry FROM moz_cookies WHERE host = ? OR host LIKE ?",
+                (domain, f"%.{domain}")
+            ).fetchall())
+            yield {name: value for name, value, _ in rows}, {name: expiry or None for name, _, expiry in rows}
@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from LuoguBusPlugins import PluginRegistry
+
+
+# 各平台浏览器的数据目录：[(浏览器名, 后端, (基准目录环境变量, 相对路径)), ...]
+BROWSERS = {
+    "win32": [
+        ("Chrome", "chromium", ("LOCALAPPDATA", "Google/Chrome/User Data")),
+        ("Edge", "chromium", ("LOCALAPPDATA", "Microsoft/Edge/User Data")),
+        ("Brave", "chromium", ("LOCALAPPDATA", "BraveSoftware/Brave-Browser/User Data")),
+        ("Firefox", "firefox", ("APPDATA", "Mozilla/Firefox")),
+    ],
+    "linux": [
+        ("Chrome", "chromium", ("XDG_CONFIG_HOME", "google-chrome")),
+        ("Chromium", "chromium", ("XDG_CONFIG_HOME", "chromium")),
+        ("Edge", "chromium", ("XDG_CONFIG_HOME", "microsoft-edge")),
+        ("Brave", "chromium", ("XDG_CONFIG_HOME", "BraveSoftware/Brave-Browser")),
+        ("Firefox", "firefox", ("HOME", ".mozilla/firefox")),
+    ],
+}
+
+# 浏览器后端：只有缓存失效、确实需要读取浏览器时才导入（以及其中用到的 cryptography）
+COOKIE_BACKENDS = PluginRegistry("浏览器")
+COOKIE_BACKENDS.register("chromium", "LuoguBusBrowsers:ChromiumCookies")
+COOKIE_BACKENDS.register("firefox", "LuoguBusBrowsers:FirefoxCookies")
+
+# 已提取的Cookie缓存文件，以及缓存的最长有效期（Cookie本身更早过期时以Cookie为准）
+CREDENTIAL_FILE = os.path.join(os.path.expanduser("~"), ".luogubus_credentials.json")
+CREDENTIAL_TTL = 7 * 24 * 3600
+
+
+def platform_key():
+    return "win32" if sys.platform == "win32" else "linux" if sys.platform.startswith("linux") else sys.platform
+
+
+def base_dir(variable):
+    """平台基准目录：环境变量未设置时使用默认位置"""
+    value = os.environ.get(variable)
+    if value:
+        return Path(value)
+    if variable == "XDG_CONFIG_HOME":
+        return Path.home() / ".config"
+    if variable == "HOME":
+        return Path.home()
+    return None
+
+
+def default_browsers(platform=None):
+    """当前平台上存在数据目录的浏览器"""
+    browsers = []
+    for name, backend, (variable, relative) in BROWSERS.get(platform or platform_key(), []):
+        base = base_dir(variable)
+        if base is not None and (base / relative).is_dir():
+            browsers.append(COOKIE_BACKENDS.load(backend)(base / relative, name))
+    return browsers
+
+
+def extract_credentials(domain, required=("__client_id", "_uid"), browsers=None):
+    """依次查找各浏览器的各配置文件，返回第一个包含全部 required Cookie 的
+    {"cookies": {...}, "expires": 最早过期时间戳或None, "source": 浏览器名}，都没有时返回 None
+    """
+    for browser in default_browsers() if browsers is None else browsers:
+        try:
+            for cookies, expires in browser.iter_cookies(domain):
+                if all(cookies.get(name) for name in required):
+                    print(f"已从 {browser.name} 读取Cookie")
+                    deadlines = [expires[name] for name in required if expires.get(name)]
+                    return {
+                        "cookies": {name: cookies[name] for name in required},
+                        "expires": min(deadlines) if deadlines else None,
+                        "source": browser.name,
+                    }
+        except Exception as e:
+            print(f"读取 {browser.name} 的Cookie失败: {str(e)}")
+    return None
+
+
+# 已提取的Cookie缓存：只有当前用户可读写，过期或失效后才重新访问浏览器
+class CredentialCache:
+    def __init__(self, path=CREDENTIAL_FILE, ttl=CREDENTIAL_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self, required=("__client_id", "_uid")):
+        """返回缓存的Cookie字典；不存在、已过期或内容不完整时返回 None"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        cookies = entry.get("cookies") or {}
+        if now - entry.get("saved_at", 0) > self.ttl or (entry.get("expires") and entry["expires"] <= now) \
+                or not all(cookies.get(name) for name in required):
+            self.clear()
+            return None
+        if os.name == "posix" and os.stat(self.path).st_mode & 0o077:
+            os.chmod(self.path, 0o600)  # 权限被放宽过，恢复为仅当前用户可读写
+        return cookies
+
+    def save(self, cookies, expires=None, source=None):
+        temp_path = f"{self.path}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"cookies": cookies, "expires": expires, "source": source, "saved_at": time.time()}, f)
+        os.replace(temp_path, self.path)
+        if os.name == "posix":
+            os.chmod(self.path, 0o600)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def get_credentials(domain, cache=None, refresh=False, browsers=None):
+    """优先使用缓存的Cookie，没有缓存、已过期或 refresh 为真时才从浏览器提取并写入缓存"""
+    cache = cache or CredentialCache()
+    if not refresh:
+        cookies = cache.load()
+        if cookies:
+            return cookies
+    found = extract_credentials(domain, browsers=browsers)
+    if not found:
+        return {}
+    cache.save(found["cookies"], found["expires"], found["source"])
+    return found["cookies"]
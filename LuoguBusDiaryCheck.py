@@ -0,0 +1,125 @@
+import csv
+import os
+import shutil
+import sys
+import tempfile
+
+from openpyxl import Workbook, load_workbook
+
+from LuoguBusExcel import ExcelDiaryWriter
+from LuoguBusExport import CsvDiaryWriter, export_records, open_appenders
+from LuoguBusRecord import Submission
+from LuoguBusStore import SubmissionStore
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 本地库中的记录（fixtures 中最后一条记录是 10000002）
+RECORDS = [
+    Submission(10000003, 1700029000, "P1003", "铺地毯", 12, 15, 1024),
+    Submission(10000004, 1700029100, "P1004", "方格取数", 4, 1000, 4096),
+    Submission(10000005, 1700029200, "P1005", "矩阵取数游戏", 12, 80, 2048),
+]
+HEADERS = dict(zip(CsvDiaryWriter.fieldnames, ExcelDiaryWriter.headers))
+
+
+def read_csv_rows(filename):
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+
+def xlsx_fixture(source, filename):
+    """按 CSV 夹具生成同样内容的Excel日记（中文表头），末尾再加一行只有格式没有内容的空行"""
+    header, *rows = read_csv_rows(source)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "刷题记录"
+    ws.append([HEADERS.get(name, name) for name in header])
+    for row in rows:
+        ws.append([int(value) if value.isdigit() else (value or None) for value in row])
+    ws.cell(row=ws.max_row + 1, column=1).number_format = "yyyy-mm-dd"
+    wb.save(filename)
+
+
+def append(base, formats, store, known=2):
+    """模拟 --update：本地库中有前 known 条记录，把比各文件最后一条记录新的追加进去"""
+    appenders, rebuild = open_appenders(base, formats, store)
+    for appender in appenders:
+        export_records([record for record in RECORDS[:known] if record.id > appender.last_id], [appender])
+    return appenders, rebuild
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+    print(f"✓ {message}")
+
+
+def check_csv(workdir, store):
+    base = os.path.join(workdir, "notes")
+    shutil.copy(os.path.join(FIXTURES, "diary_notes.csv"), base + ".csv")
+    before = read_csv_rows(base + ".csv")
+
+    appenders, _ = append(base, ["csv"], store)
+    check([appender.last_id for appender in appenders] == [10000002], "CSV: 跨多行的备注后仍找到最后一条记录")
+    rows = read_csv_rows(base + ".csv")
+    check(rows[:len(before)] == before, "CSV: 原有内容（多行备注、只有备注的行）保持不变")
+    check([row[8] for row in rows[len(before):]] == ["10000003", "10000004"], "CSV: 新记录追加在所有内容之后")
+    check(all(len(row) == len(before[0]) for row in rows[len(before):]), "CSV: 新记录为备注列留空")
+
+    check(store.diary_mark(base + ".csv")[0] == 10000004, "CSV: 追加后记住最后一条记录")
+    appenders, _ = append(base, ["csv"], store)
+    check(appenders[0].last_id == 10000004 and read_csv_rows(base + ".csv") == rows,
+          "CSV: 文件未改动时按记录的位置追加")
+
+    # 用户在文件末尾又写了一条备注（没有换行），记录的状态失效，重新解析整个文件
+    with open(base + ".csv", "a", encoding="utf-8") as f:
+        f.write(",,,,,,,,,,又补了一条备注")
+    appenders, _ = append(base, ["csv"], store, known=3)
+    rows = read_csv_rows(base + ".csv")
+    check(appenders[0].last_id == 10000004 and rows[-2][-1] == "又补了一条备注" and rows[-1][8] == "10000005",
+          "CSV: 文件改动后重新解析，新记录另起一行")
+
+    base = os.path.join(workdir, "old")
+    shutil.copy(os.path.join(FIXTURES, "diary_no_id.csv"), base + ".csv")
+    with open(base + ".csv", "rb") as f:
+        content = f.read()
+    appenders, rebuild = append(base, ["csv"], store)
+    with open(base + ".csv", "rb") as f:
+        check(not appenders and not rebuild and f.read() == content, "CSV: 没有记录ID列的旧日记不追加也不覆盖")
+
+
+def check_xlsx(workdir, store):
+    base = os.path.join(workdir, "notes")
+    xlsx_fixture(os.path.join(FIXTURES, "diary_notes.csv"), base + ".xlsx")
+
+    appenders, _ = append(base, ["xlsx"], store)
+    check([appender.last_id for appender in appenders] == [10000002], "Excel: 找到最后一条记录")
+    ws = load_workbook(base + ".xlsx")["刷题记录"]
+    check(ws.cell(row=3, column=11).value == "第二个点\n边界没判", "Excel: 多行备注保持不变")
+    check(ws.cell(row=4, column=11).value == "只写了备注的一行", "Excel: 只有备注的行没有被覆盖")
+    check([ws.cell(row=row, column=9).value for row in (5, 6)] == [10000003, 10000004],
+          "Excel: 新记录追加在所有内容之后，不跳过只带格式的空行")
+
+    base = os.path.join(workdir, "old")
+    xlsx_fixture(os.path.join(FIXTURES, "diary_no_id.csv"), base + ".xlsx")
+    appenders, rebuild = append(base, ["xlsx"], store)
+    ws = load_workbook(base + ".xlsx").active
+    check(not appenders and not rebuild and ws.cell(row=2, column=9).value == "手写的备注"
+          and ws.cell(row=3, column=1).value is None,
+          "Excel: 没有记录ID列的旧日记不追加也不覆盖")
+
+
+def main():
+    """用 fixtures 中带备注的日记检查追加模式（--update/--watch）不会破坏用户的备注"""
+    with tempfile.TemporaryDirectory() as workdir:
+        store = SubmissionStore(os.path.join(workdir, "LuoguBus.db"))
+        try:
+            check_csv(workdir, store)
+            check_xlsx(workdir, store)
+        finally:
+            store.close()
+    print("✓ 日记追加检查全部通过")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
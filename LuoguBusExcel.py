@@ -0,0 +1,251 @@
+import os
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from LuoguBusAnalytics import AC_STATUS, TrainingAnalytics
+from LuoguBusRecord import STATUS_COLORS
+
+
+def register_diary_styles(wb, status_colors):
+    """在工作簿中预先注册表头、数据单元格和各状态的命名样式，所有单元格共享同一份样式（已存在的样式跳过）"""
+    existing = set(wb.named_styles)
+
+    def add(style):
+        if style.name not in existing:
+            wb.add_named_style(style)
+
+    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                         top=Side(style='thin'), bottom=Side(style='thin'))
+
+    # 表头样式
+    add(NamedStyle(
+        name="diary_header",
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True),
+        border=thin_border
+    ))
+
+    # 数据样式
+    data_alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
+    add(NamedStyle(name="diary_cell", alignment=data_alignment, border=thin_border))
+
+    # 每种状态一个着色样式
+    for status, color in status_colors.items():
+        add(NamedStyle(
+            name=f"diary_status_{status}",
+            font=Font(color="FFFFFF"),
+            fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+            alignment=data_alignment,
+            border=thin_border
+        ))
+
+
+def add_table_sheet(wb, title, headers, rows, widths):
+    """追加一个只写工作表：带样式的表头 + 数据行"""
+    ws = wb.create_sheet(title)
+    for index, width in enumerate(widths):
+        ws.column_dimensions[chr(ord("A") + index)].width = width
+    ws.freeze_panes = "A2"
+    header_cells = []
+    for text in headers:
+        cell = WriteOnlyCell(ws, text)
+        cell.style = "diary_header"
+        header_cells.append(cell)
+    ws.append(header_cells)
+    for row in rows:
+        ws.append(row)
+
+
+def add_analytics_sheets(wb, summary):
+    """在工作簿末尾追加统计工作表：概览、每日/每周提交、各题尝试次数、运行时间和内存分布"""
+    if not summary.get("total"):
+        return
+    time_ms = summary["time_ms"]
+    memory_kb = summary["memory_kb"]
+    overview = [
+        ("提交总数", summary["total"]),
+        ("AC次数", summary["accepted"]),
+        ("AC率", f"{summary['ac_rate']:.2%}"),
+        ("尝试题目数", summary["problems_attempted"]),
+        ("通过题目数", summary["problems_solved"]),
+        ("有提交的天数", summary["active_days"]),
+        ("最长连续天数", summary["longest_streak"]),
+        ("当前连续天数", summary["current_streak"]),
+    ]
+    for label, stats, unit in (("运行时间", time_ms, "ms"), ("内存占用", memory_kb, "KB")):
+        for key in ("p50", "p90", "p99", "max"):
+            overview.append((f"AC{label} {key.upper()}", f"{stats[key]}{unit}" if stats[key] is not None else ""))
+    add_table_sheet(wb, "统计概览", ["指标", "数值"], overview, [20, 15])
+
+    add_table_sheet(wb, "每日提交", ["日期", "提交次数", "AC次数"],
+                    ((day["date"], day["submissions"], day["accepted"]) for day in summary["daily"]), [15, 12, 12])
+    add_table_sheet(wb, "每周提交", ["周一日期", "提交次数", "AC次数"],
+                    ((week["week_start"], week["submissions"], week["accepted"]) for week in summary["weekly"]),
+                    [15, 12, 12])
+    add_table_sheet(wb, "题目统计", ["题号", "题目名称", "提交次数", "首次AC前提交次数", "首次AC日期"],
+                    ((problem["pid"], problem["title"], problem["attempts"],
+                      problem["attempts_before_ac"] if problem["attempts_before_ac"] is not None else "未通过",
+                      problem["first_ac"] or "")
+                     for problem in summary["problems"]), [15, 40, 12, 18, 15])
+    add_table_sheet(wb, "资源分布", ["运行时间", "AC次数", "内存占用", "AC次数"],
+                    ((time_bucket["range"], time_bucket["count"], memory_bucket["range"], memory_bucket["count"])
+                     for time_bucket, memory_bucket in zip(time_ms["histogram"], memory_kb["histogram"])),
+                    [15, 12, 20, 12])
+
+
+def write_shard_index(filename, shards):
+    """分片导出的索引工作簿：每个分片一行（时间段、记录数、AC数、起止时间和文件链接），后面附带全部记录的统计工作表
+
+    shards 为 [(时间段, 分片文件名, [DiaryRow, ...]), ...]
+    """
+    wb = Workbook(write_only=True)
+    register_diary_styles(wb, STATUS_COLORS)
+    analytics = TrainingAnalytics()
+    index_rows = []
+    for period, shard_filename, rows in shards:
+        accepted = 0
+        for row in rows:
+            analytics.write(row)
+            accepted += row.status_code == AC_STATUS
+        # 分片文件与索引在同一目录，链接只用文件名
+        link = os.path.basename(shard_filename)
+        index_rows.append((
+            period, len(rows), accepted, f"{accepted / len(rows):.2%}", rows[0].submit_minute,
+            rows[-1].submit_minute, f'=HYPERLINK("{link}","{link}")',
+        ))
+    add_table_sheet(wb, "分片索引", ["时间段", "记录数", "AC次数", "AC率", "首次提交", "最后提交", "文件"], index_rows,
+                    [12, 10, 10, 10, 20, 20, 40])
+    add_analytics_sheets(wb, analytics.summary())
+    wb.save(filename)
+    print(f"✓ 已生成分片索引: {filename}")
+
+
+# Excel导出：逐条写入，行数据直接流式写入磁盘，同时收集统计数据，保存前追加统计工作表
+class ExcelDiaryWriter:
+    headers = [
+        "提交日期", "题号", "题目名称", "状态", "运行时间", "内存占用", "难度", "标签", "记录ID", "源代码"
+    ]
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.analytics = TrainingAnalytics()
+
+        # 只写模式：内存占用不随行数增长
+        self.wb = Workbook(write_only=True)
+        self.ws = ws = self.wb.create_sheet("刷题记录")
+
+        # 设置列宽
+        column_widths = {
+            'A': 20, 'B': 15, 'C': 40,
+            'D': 10, 'E': 15, 'F': 15,
+            'G': 15, 'H': 40, 'I': 12,
+            'J': 12
+        }
+        for col, width in column_widths.items():
+            ws.column_dimensions[col].width = width
+
+        ws.freeze_panes = "A2"
+
+        register_diary_styles(self.wb, STATUS_COLORS)
+
+        # 写入表头
+        header_cells = []
+        for title in self.headers:
+            cell = WriteOnlyCell(ws, title)
+            cell.style = "diary_header"
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        # 只写模式下 append 会立即序列化整行，因此每列的单元格对象可以逐行复用
+        self.row_cells = []
+        for _ in self.headers:
+            cell = WriteOnlyCell(ws)
+            cell.style = "diary_cell"
+            self.row_cells.append(cell)
+        self.plain_status_cell = self.row_cells[3]
+        self.status_cells = {}
+        for status in STATUS_COLORS:
+            cell = WriteOnlyCell(ws)
+            cell.style = f"diary_status_{status}"
+            self.status_cells[status] = cell
+
+    @staticmethod
+    def values(row):
+        return [
+            row.submit_minute,
+            row.pid,
+            row.title,
+            row.status,
+            f"{row.time}ms",
+            f"{row.memory}KB",
+            row.difficulty,
+            row.tags,
+            row.id,
+            # 源代码链接（相对路径，日记和归档目录一起移动时链接仍然有效）
+            f'=HYPERLINK("{row.source}","查看源代码")' if row.source else "",
+        ]
+
+    def write(self, row):
+        row_cells = self.row_cells
+        row_cells[3] = self.status_cells.get(row.status, self.plain_status_cell)
+        for cell, value in zip(row_cells, self.values(row)):
+            cell.value = value
+        self.ws.append(row_cells)
+        self.analytics.write(row)
+
+    def close(self):
+        add_analytics_sheets(self.wb, self.analytics.summary())
+        self.wb.save(self.filename)
+        print(f"✓ 已生成Excel文件: {self.filename}")
+
+
+# 在已有的Excel日记末尾追加新记录，保留用户手写的备注列和修改过的单元格
+# 打开已有文件无法使用只写模式，openpyxl 会完整加载工作簿
+class ExcelDiaryAppender:
+    def __init__(self, filename, marks=None):
+        self.filename = filename
+        self.count = 0
+        self.last_id = None
+        self.wb = load_workbook(filename)
+        self.ws = ws = self.wb["刷题记录"] if "刷题记录" in self.wb.sheetnames else self.wb.active
+
+        # 按表头找到记录ID列，旧版本生成的日记没有这一列，无法追加
+        header = [cell.value for cell in ws[1]]
+        if "记录ID" not in header:
+            return
+        id_column = header.index("记录ID") + 1
+        # 按表头名称放置各列：旧文件中没有的列（如源代码）不写，不会覆盖用户的备注列
+        self.columns = [header.index(name) + 1 if name in header else None for name in ExcelDiaryWriter.headers]
+        self.status_column = header.index("状态") + 1 if "状态" in header else None
+
+        # 从最后一行往上找最后一条记录
+        for row in range(ws.max_row, 1, -1):
+            value = ws.cell(row=row, column=id_column).value
+            if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+                self.last_id = int(value)
+                break
+        # 新记录写在所有内容之后：最后一条记录下面可能还有只写了备注的行，
+        # 只带格式没有内容的空行不算（max_row 会把它们算进去）
+        self.next_row = 2
+        for row in range(ws.max_row, 1, -1):
+            if any(cell.value is not None and cell.value != "" for cell in ws[row]):
+                self.next_row = row + 1
+                break
+        register_diary_styles(self.wb, STATUS_COLORS)
+
+    def write(self, row):
+        for column, value in zip(self.columns, ExcelDiaryWriter.values(row)):
+            if column is None:
+                continue
+            cell = self.ws.cell(row=self.next_row, column=column, value=value)
+            cell.style = f"diary_status_{row.status}" if column == self.status_column and row.status in STATUS_COLORS \
+                else "diary_cell"
+        self.next_row += 1
+        self.count += 1
+
+    def close(self):
+        if self.count:
+            self.wb.save(self.filename)
+        print(f"✓ 已追加 {self.count} 条记录到Excel文件: {self.filename}")
@@ -0,0 +1,458 @@
+import csv
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from LuoguBusMetrics import METRICS
+from LuoguBusPlugins import PluginRegistry
+from LuoguBusRecord import normalize_records
+
+
+# CSV导出：逐条写入，第一条记录到达时才创建文件（没有记录时不生成文件）
+class CsvDiaryWriter:
+    fieldnames = [
+        "submit_time", "problem_id", "problem_name", "status", "run_time", "memory_usage", "difficulty", "tags",
+        "record_id", "source_file"
+    ]
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        self.writer = None
+
+    def write(self, row):
+        if self.file is None:
+            self.file = open(self.filename, 'w', newline='', encoding='utf-8-sig')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.fieldnames)
+
+        self.writer.writerow(self.row(row))
+
+    def row(self, row):
+        return [
+            row.submit_second,
+            row.pid,
+            row.title,
+            row.status,
+            row.time,
+            row.memory,
+            row.difficulty,
+            row.tags,
+            row.id,
+            row.source
+        ]
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        print(f"✓ 已生成CSV文件: {self.filename}")
+
+
+def read_csv_header(filename):
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+
+def read_csv_last_record(filename):
+    """逐行解析整个文件（只保留当前行，不读入内存），返回 (表头, 最后一条有记录ID的行, 是否以换行结尾)
+
+    备注中可能有换行和引号，从末尾倒着找行首无法确定是否处在引号内，所以从头解析；
+    最后一条记录之后只写了备注的行会被跳过
+    """
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        last = []
+        if "record_id" in header:
+            id_column = header.index("record_id")
+            for row in reader:
+                if len(row) > id_column and row[id_column].strip().isdigit():
+                    last = row
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return header, last, True
+        f.seek(-1, os.SEEK_END)
+        ends_with_newline = f.read(1) in (b"\n", b"\r")
+    return header, last, ends_with_newline
+
+
+# 在已有的CSV日记末尾追加新记录：已有内容（包括备注列）保持不变
+# marks（SubmissionStore）中记录了上次追加后的文件状态，文件没有改动过时只读表头，不必解析整个文件
+class CsvDiaryAppender(CsvDiaryWriter):
+    def __init__(self, filename, marks=None):
+        super().__init__(filename)
+        self.marks = marks
+        self.count = 0
+        self.last_id = None
+        mark = marks.diary_mark(filename) if marks is not None else None
+        stat = os.stat(filename)
+        if mark and mark[1:] == (stat.st_size, stat.st_mtime_ns):
+            header = read_csv_header(filename)
+            last = None
+            self.last_id = mark[0]
+            self.ends_with_newline = True  # 上次追加由 csv.writer 写入，以换行结尾
+        else:
+            header, last, self.ends_with_newline = read_csv_last_record(filename)
+        if "record_id" not in header:
+            self.last_id = None
+            return  # 旧版本生成的日记没有记录ID列，无法追加
+        self.width = len(header)
+        # 按表头名称放置各列：旧文件中没有的列不写，用户添加的备注列留空
+        self.positions = [header.index(name) if name in header else None for name in self.fieldnames]
+        if last:
+            self.last_id = int(last[header.index("record_id")].strip())
+        self.written_id = self.last_id
+
+    def write(self, row):
+        if self.file is None:
+            self.file = open(self.filename, 'a', newline='', encoding='utf-8')
+            # 文件末尾没有换行时先补上，避免新记录接在最后一行后面
+            if not self.ends_with_newline:
+                self.file.write("\r\n")
+            self.writer = csv.writer(self.file)
+
+        values = [""] * self.width
+        for position, value in zip(self.positions, self.row(row)):
+            if position is not None:
+                values[position] = value
+        self.writer.writerow(values)
+        self.written_id = row.id
+        self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.marks is not None and self.written_id is not None:
+            self.marks.save_diary_mark(self.filename, self.written_id)
+        print(f"✓ 已追加 {self.count} 条记录到CSV文件: {self.filename}")
+
+
+# 多账号汇总CSV：在每行前面加上 uid 列
+class CombinedCsvDiaryWriter(CsvDiaryWriter):
+    fieldnames = ["uid"] + CsvDiaryWriter.fieldnames
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.uid = ""
+
+    def row(self, row):
+        return [self.uid] + super().row(row)
+
+    def for_account(self, uid):
+        """返回写入某个账号记录的导出对象，可与该账号的其他格式一起传给 export_records"""
+        return CombinedAccountWriter(self, uid)
+
+
+# 汇总CSV中某个账号的部分：关闭时不会关闭汇总文件
+class CombinedAccountWriter:
+    def __init__(self, combined, uid):
+        self.combined = combined
+        self.uid = uid
+
+    def write(self, row):
+        self.combined.uid = self.uid
+        self.combined.write(row)
+
+    def close(self):
+        pass
+
+
+# gzip压缩的CSV：流式写入，供下游分析程序使用（不带BOM）
+class GzipCsvDiaryWriter(CsvDiaryWriter):
+    def write(self, row):
+        if self.file is None:
+            self.file = gzip.open(self.filename, 'wt', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.fieldnames)
+
+        self.writer.writerow(self.row(row))
+
+
+# gzip压缩的NDJSON：每行一条记录，保留原始数值（时间戳、状态码等）
+class NdjsonDiaryWriter:
+    fields = ("id", "submit_time", "pid", "title", "status", "status_code", "time", "memory", "language", "score",
+              "difficulty", "tags", "source")
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = gzip.open(filename, 'wt', encoding='utf-8')
+
+    def write(self, row):
+        self.file.write(json.dumps({name: getattr(row, name) for name in self.fields}, ensure_ascii=False))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+        print(f"✓ 已生成NDJSON文件: {self.filename}")
+
+
+# Parquet列式存储（需要 pyarrow）：按 row_group_size 条一组分批写入，内存占用有上限
+class ParquetDiaryWriter:
+    row_group_size = 10000
+
+    def __init__(self, filename):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.filename = filename
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.int64()),
+            ("submit_time", pa.timestamp("s")),
+            ("pid", pa.string()),
+            ("title", pa.string()),
+            ("status", pa.string()),
+            ("status_code", pa.int16()),
+            ("time", pa.int32()),
+            ("memory", pa.int32()),
+            ("language", pa.int16()),
+            ("score", pa.int16()),
+            ("difficulty", pa.string()),
+            ("tags", pa.string()),
+            ("source", pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(filename, self.schema, compression="zstd")
+        self.columns = {name: [] for name in self.schema.names}
+
+    def write(self, row):
+        columns = self.columns
+        for name in self.schema.names:
+            columns[name].append(getattr(row, name))
+        if len(columns["id"]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.columns["id"]:
+            return
+        self.writer.write_table(self.pa.Table.from_pydict(self.columns, schema=self.schema))
+        self.columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        print(f"✓ 已生成Parquet文件: {self.filename}")
+
+
+# 可选的导出格式：格式名 -> 导出类（附带文件扩展名），Excel 导出在第一次使用时才导入 openpyxl
+EXPORTERS = PluginRegistry("导出格式")
+EXPORTERS.register("xlsx", "LuoguBusExcel:ExcelDiaryWriter", extension="xlsx")
+EXPORTERS.register("csv", CsvDiaryWriter, extension="csv")
+EXPORTERS.register("csv.gz", GzipCsvDiaryWriter, extension="csv.gz")
+EXPORTERS.register("ndjson.gz", NdjsonDiaryWriter, extension="ndjson.gz")
+EXPORTERS.register("parquet", ParquetDiaryWriter, extension="parquet")
+EXPORTERS.register("summary.json", "LuoguBusAnalytics:SummaryJsonWriter", extension="summary.json", problem_meta=False)
+# 支持在已有文件末尾追加新记录的格式：格式名 -> 追加类
+APPENDERS = PluginRegistry("追加格式")
+APPENDERS.register("xlsx", "LuoguBusExcel:ExcelDiaryAppender")
+APPENDERS.register("csv", CsvDiaryAppender)
+DEFAULT_FORMATS = ("xlsx", "csv")
+# 计算量大的格式放到子进程中生成，其余格式在线程中生成
+PROCESS_FORMATS = {"xlsx", "parquet"}
+# 记录数低于该值时并行导出的进程启动开销得不偿失
+PARALLEL_EXPORT_MIN_ROWS = 500
+# 分片导出的时间段：名称 -> 取 submit_minute（"YYYY-MM-DD HH:MM"）的前几个字符作为分片键
+SHARD_PERIODS = {"month": 7, "year": 4}
+
+
+def parse_formats(text):
+    """解析逗号分隔的格式列表，空字符串表示默认格式"""
+    formats = [name.strip().lower() for name in text.split(",") if name.strip()]
+    if not formats:
+        return list(DEFAULT_FORMATS)
+    unknown = [name for name in formats if name not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"不支持的格式: {', '.join(unknown)}（可选: {', '.join(EXPORTERS)}）")
+    return list(dict.fromkeys(formats))
+
+
+def uses_problem_meta(formats):
+    """所选格式中是否有带难度、标签列的格式（登记时 problem_meta=False 的格式不需要题目元数据）"""
+    return any(EXPORTERS.info(name).get("problem_meta", True) for name in formats)
+
+
+def format_filename(base_filename, name):
+    return f"{base_filename}.{EXPORTERS.info(name)['extension']}"
+
+
+def make_writers(base_filename, formats=DEFAULT_FORMATS):
+    """按格式列表创建导出对象，缺少可选依赖的格式会被跳过"""
+    writers = []
+    for name in formats:
+        try:
+            writers.append(EXPORTERS.load(name)(format_filename(base_filename, name)))
+        except ImportError as e:
+            print(f"⚠️ 跳过 {name} 格式: 缺少依赖库 {e.name}，请执行: pip install {e.name}")
+    return writers
+
+
+def open_appenders(base_filename, formats, marks=None):
+    """已存在且可以追加的日记文件打开为追加对象，返回 (追加对象列表, 需要新生成的格式列表)
+
+    已存在却无法追加的文件（没有记录ID列或找不到记录）可能有手写的备注，不会被覆盖，跳过并提示；
+    marks（SubmissionStore）用于记住上次追加到的位置
+    """
+    appenders = []
+    rebuild = []
+    for name in formats:
+        filename = format_filename(base_filename, name)
+        if name in APPENDERS and os.path.exists(filename):
+            try:
+                appender = APPENDERS.load(name)(filename, marks)
+            except ImportError as e:
+                print(f"⚠️ 跳过 {name} 格式: 缺少依赖库 {e.name}，请执行: pip install {e.name}")
+                continue
+            if appender.last_id is not None:
+                appenders.append(appender)
+            else:
+                print(f"❌ {filename} 中没有记录ID列或找不到记录，无法追加；为保留其中的备注不会覆盖，"
+                      f"请改名或移走该文件后重新运行")
+            continue
+        rebuild.append(name)
+    return appenders, rebuild
+
+
+def export_records(records, writers, problems=None, sources=None):
+    """记录流只归一化一次，同时写入所有导出文件，返回记录条数和首末提交时间"""
+    summary = {"count": 0, "first": None, "last": None}
+    # 流式导出时读取、归一化和写文件交替进行，分别累计耗时
+    normalize_seconds = write_seconds = 0.0
+    clock = time.perf_counter
+    rows = normalize_records(records, problems, sources)
+    try:
+        while True:
+            started = clock()
+            row = next(rows, None)
+            normalized = clock()
+            normalize_seconds += normalized - started
+            if row is None:
+                break
+            for writer in writers:
+                writer.write(row)
+            write_seconds += clock() - normalized
+            if summary["first"] is None:
+                summary["first"] = row.submit_time
+            summary["last"] = row.submit_time
+            summary["count"] += 1
+    finally:
+        started = clock()
+        for writer in writers:
+            writer.close()
+        METRICS.add_phase("normalize", normalize_seconds, summary["count"])
+        METRICS.add_phase("export", write_seconds + clock() - started, summary["count"])
+    return summary
+
+
+def write_rows(base_filename, name, rows):
+    """把已归一化的行写成一种格式（在线程或子进程中执行）"""
+    for writer in make_writers(base_filename, [name]):
+        try:
+            for row in rows:
+                writer.write(row)
+        finally:
+            writer.close()
+
+
+def export_parallel(records, base_filename, formats=DEFAULT_FORMATS, problems=None, sources=None):
+    """先归一化一次，再把各格式分派到进程池/线程池并行导出，总耗时接近最慢的那一种格式"""
+    from concurrent.futures import ProcessPoolExecutor  # 导入 multiprocessing 较慢，只在并行导出时需要
+
+    with METRICS.phase("normalize") as stats:
+        rows = list(normalize_records(records, problems, sources))
+        stats["rows"] = len(rows)
+    summary = {
+        "count": len(rows),
+        "first": rows[0].submit_time if rows else None,
+        "last": rows[-1].submit_time if rows else None,
+    }
+
+    process_formats = [name for name in formats if name in PROCESS_FORMATS]
+    thread_formats = [name for name in formats if name not in PROCESS_FORMATS]
+    with METRICS.phase("export") as stats, \
+            ProcessPoolExecutor(max_workers=max(1, len(process_formats))) as processes, \
+            ThreadPoolExecutor(max_workers=max(1, len(thread_formats))) as threads:
+        stats["rows"] = len(rows)
+        futures = [processes.submit(write_rows, base_filename, name, rows) for name in process_formats]
+        futures += [threads.submit(write_rows, base_filename, name, rows) for name in thread_formats]
+        for future in futures:
+            future.result()
+    return summary
+
+
+def shard_rows(rows, period):
+    """按提交时间所在的月或年把行分组，返回按时间升序的 [(时间段, [DiaryRow, ...]), ...]"""
+    width = SHARD_PERIODS[period]
+    shards = {}
+    for row in rows:
+        shards.setdefault(row.submit_minute[:width], []).append(row)
+    return sorted(shards.items())
+
+
+def export_sharded(records, base_filename, formats=DEFAULT_FORMATS, period="month", problems=None, sources=None):
+    """分片导出：Excel 按月或年拆成多个工作簿 <base>_<时间段>.xlsx，在子进程中并行生成，
+    再生成链接各分片的索引工作簿 <base>_index.xlsx；其他格式照常生成完整文件
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    with METRICS.phase("normalize") as stats:
+        rows = list(normalize_records(records, problems, sources))
+        stats["rows"] = len(rows)
+    summary = {
+        "count": len(rows),
+        "first": rows[0].submit_time if rows else None,
+        "last": rows[-1].submit_time if rows else None,
+    }
+    shards = shard_rows(rows, period) if "xlsx" in formats else []
+    other_formats = [name for name in formats if name != "xlsx"]
+
+    # 每个分片只把自己的行传给子进程，生成时间和内存占用取决于分片大小而不是全部记录数
+    with METRICS.phase("export") as stats, \
+            ProcessPoolExecutor(max_workers=max(1, min(len(shards), os.cpu_count() or 1))) as processes, \
+            ThreadPoolExecutor(max_workers=max(1, len(other_formats))) as threads:
+        stats["rows"] = len(rows)
+        futures = [processes.submit(write_rows, f"{base_filename}_{key}", "xlsx", shard) for key, shard in shards]
+        futures += [threads.submit(write_rows, base_filename, name, rows) for name in other_formats]
+        for future in futures:
+            future.result()
+
+    if shards:
+        try:
+            from LuoguBusExcel import write_shard_index
+        except ImportError as e:
+            print(f"⚠️ 跳过分片索引: 缺少依赖库 {e.name}，请执行: pip install {e.name}")
+            return summary
+        write_shard_index(f"{base_filename}_index.xlsx",
+                          [(key, format_filename(f"{base_filename}_{key}", "xlsx"), shard) for key, shard in shards])
+    return summary
+
+
+def worth_parallel(formats, rows):
+    """是否值得并行导出：Excel、Parquet 在子进程中生成最慢，只有同时还有其他格式、记录数足够多且有多个CPU时，
+    其他格式才能和它们同时生成，否则单次遍历更快
+    """
+    return (rows >= PARALLEL_EXPORT_MIN_ROWS and len(formats) > 1 and bool(PROCESS_FORMATS & set(formats))
+            and (os.cpu_count() or 1) > 1)
+
+
+def export_diary(records, base_filename, formats=DEFAULT_FORMATS, parallel=False, problems=None, sources=None,
+                 shard=None):
+    """导出日记：shard 为 "month"/"year" 时 Excel 按时间段分片导出；parallel 为真且有多种格式时并行导出，
+    否则单次遍历流式导出
+    """
+    if shard and "xlsx" in formats:
+        return export_sharded(records, base_filename, formats, shard, problems, sources)
+    if parallel and len(formats) > 1:
+        return export_parallel(records, base_filename, formats, problems, sources)
+    return export_records(records, make_writers(base_filename, formats), problems, sources)
+
+
+def create_excel(records, filename, problems=None):
+    """创建Excel文件，records 可以是任意可迭代对象（包括生成器）"""
+    export_records(records, [EXPORTERS.load("xlsx")(filename)], problems)
+
+
+def create_csv(records, filename, problems=None):
+    """创建CSV文件，records 可以是任意可迭代对象（包括生成器）"""
+    export_records(records, [CsvDiaryWriter(filename)], problems)
@@ -0,0 +1,377 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from LuoguBusMetrics import METRICS
+from LuoguBusRecord import loads
+
+
+LUOGU_BASE_URL = "https://www.luogu.com.cn"
+
+# 所有账号共用的请求头，每个账号只需额外携带 Referer 和 Cookie
+BASE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "X-Luogu-Type": "content-only",
+    "X-Requested-With": "XMLHttpRequest",
+    "Accept": "application/json",
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5  # 第一次重试前的基准等待时间（秒）
+BACKOFF_MAX = 30.0
+
+
+class LuoguRequestError(Exception):
+    """请求洛谷失败（重试后仍失败，或接口返回错误）；code 为接口返回的错误码，没有时为 None"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+# 表示内容不存在或无权查看的错误码（HTTP 状态码或接口返回的 code），再次请求结果也不会变
+NOT_FOUND_CODES = {403, 404}
+
+
+def is_not_found(error):
+    """请求失败是否因为内容不存在或无权查看，而不是超时、服务器错误、封禁等临时问题"""
+    code = getattr(error, "code", None)
+    response = getattr(error, "response", None)
+    if code is None and response is not None:
+        code = response.status_code  # raise_for_status 抛出的 HTTPError
+    return code in NOT_FOUND_CODES
+
+
+# 令牌桶限速器：所有请求共享同一个桶，保证整体请求频率不超过 rate 次/秒
+class TokenBucket:
+    def __init__(self, rate=5.0, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """取得令牌，令牌不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# 默认限速：每秒5次请求，与原先每页间隔0.2秒的频率一致
+DEFAULT_LIMITER = TokenBucket(rate=5.0)
+
+# 多账号公平调度：每个任务每轮只执行一步（一次请求），轮转执行，避免请求量大的账号饿死其他账号
+class FairScheduler:
+    def __init__(self, workers=4):
+        self.workers = workers
+
+    def run(self, jobs):
+        """jobs 需提供 step() 方法，返回 True 表示还有后续请求；所有任务完成后返回"""
+        ready = deque(jobs)
+        lock = threading.Condition()
+        running = [0]
+
+        def worker():
+            while True:
+                with lock:
+                    while not ready and running[0]:
+                        lock.wait()
+                    if not ready:
+                        return
+                    job = ready.popleft()
+                    running[0] += 1
+                try:
+                    more = job.step()
+                except Exception as e:
+                    print(f"任务执行失败: {str(e)}")
+                    more = False
+                with lock:
+                    running[0] -= 1
+                    if more:
+                        ready.append(job)  # 排到队尾，等其他账号各执行一步后再轮到它
+                    lock.notify_all()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, self.workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+# 磁盘响应缓存：新鲜期内直接使用，过期后带 ETag/Last-Modified 条件请求，总大小超限时按最近最少使用淘汰
+class ResponseCache:
+    def __init__(self, directory=".luogubus_cache", ttl=300, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(url, params, headers):
+        """按 URL、查询参数和请求账号（Cookie摘要）生成缓存键"""
+        parts = [url, json.dumps(sorted((params or {}).items()), default=str), (headers or {}).get("Cookie", "")]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.cache")
+
+    def get(self, key):
+        """返回 (元数据, 响应体)，不存在或损坏时返回 None"""
+        try:
+            with open(self.path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def is_fresh(self, meta):
+        return time.time() - meta["stored_at"] < self.ttl
+
+    def touch(self, key, meta=None):
+        """标记为最近使用；传入 meta 时同时重置新鲜期（304 重新验证成功）"""
+        if meta is not None:
+            entry = self.get(key)
+            if entry:
+                meta["stored_at"] = time.time()
+                self.put(key, entry[1], meta)
+                return
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def put(self, key, body, meta):
+        meta = dict(meta, stored_at=meta.get("stored_at") or time.time())
+        data = json.dumps(meta).encode("utf-8") + b"\n" + body
+        path = self.path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            if self.total_bytes is not None:
+                self.total_bytes += len(data) - old_size
+            self.evict()
+
+    def evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除（调用方需持有锁）"""
+        entries = None
+        if self.total_bytes is None or self.total_bytes > self.max_bytes:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".cache"):
+                    try:
+                        stat = os.stat(os.path.join(self.directory, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            self.total_bytes = sum(size for _, size, _ in entries)
+        if entries is None or self.total_bytes <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, name in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            self.total_bytes -= size
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def accept_encoding():
+    """安装了 brotli 时额外声明支持 br 压缩"""
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            pass
+    return "gzip, deflate"
+
+
+def get_session():
+    """获取全局共享的 Session（连接池复用 TCP/TLS 连接）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests 在第一次发请求时才导入，只导出本地记录时不需要
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(BASE_HEADERS)
+            session.headers["Accept-Encoding"] = accept_encoding()
+            _session = session
+        return _session
+
+
+def account_headers(luogu_uid, client_id):
+    """构造某个账号专属的请求头"""
+    return {
+        "Referer": f"{LUOGU_BASE_URL}/user/{luogu_uid}",
+        "Cookie": f"__client_id={client_id}; _uid={luogu_uid}",
+    }
+
+
+def retry_after_seconds(response):
+    """解析 Retry-After 响应头（秒数或HTTP日期），无法解析时返回None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """指数退避 + 随机抖动（full jitter）"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def decode_body(data, content_encoding):
+    """按 Content-Encoding 解压响应正文（多层压缩时按相反顺序解压）"""
+    for encoding in reversed([name.strip().lower() for name in content_encoding.split(",")]):
+        if encoding in ("", "identity"):
+            continue
+        if encoding in ("gzip", "x-gzip"):
+            data = gzip.decompress(data)
+        elif encoding == "deflate":
+            try:
+                data = zlib.decompress(data)
+            except zlib.error:
+                data = zlib.decompress(data, -zlib.MAX_WBITS)  # 不带 zlib 头的裸 deflate 数据
+        elif encoding == "br":
+            try:
+                import brotli
+            except ImportError:
+                import brotlicffi as brotli
+            data = brotli.decompress(data)
+        else:
+            raise ValueError(f"不支持的压缩格式: {encoding}")
+    return data
+
+
+def read_body(response):
+    """读取完整的响应正文，返回 (解压后的正文, 网络上传输的字节数)
+
+    不让 urllib3 自动解压、自己按原始数据解压，才能统计压缩后实际传输的大小（分块传输时也一样）
+    """
+    try:
+        raw = b"".join(response.raw.stream(64 * 1024, decode_content=False))
+    finally:
+        response.close()  # 正文已读完，连接回到连接池
+    try:
+        return decode_body(raw, response.headers.get("Content-Encoding", "")), len(raw)
+    except Exception as e:
+        raise LuoguRequestError(f"响应解压失败: {str(e)}")
+
+
+def get_json(path, params=None, headers=None, limiter=None, retries=MAX_RETRIES, timeout=15, cache=None,
+             check_code=True):
+    """GET 洛谷接口并返回解析后的JSON，遇到超时、连接错误、429/5xx 时自动重试；传入 cache 时使用磁盘缓存
+
+    check_code 为假时不检查返回体中的 code 字段（用于 /_lfe 等不带 code 的接口）
+    """
+    import requests
+    import urllib3
+
+    url = path if path.startswith("http") else LUOGU_BASE_URL + path
+    session = get_session()
+    last_error = None
+
+    cached = None
+    if cache is not None:
+        key = cache.make_key(url, params, headers)
+        cached = cache.get(key)
+        if cached and cache.is_fresh(cached[0]):
+            cache.touch(key)
+            METRICS.inc("cache_hits_total")
+            return loads(cached[1])
+        if cached:
+            # 过期的缓存：带上校验信息做条件请求，未变化时服务器只返回304
+            headers = dict(headers or {})
+            if cached[0].get("etag"):
+                headers["If-None-Match"] = cached[0]["etag"]
+            if cached[0].get("last_modified"):
+                headers["If-Modified-Since"] = cached[0]["last_modified"]
+
+    for attempt in range(retries + 1):
+        if attempt:
+            METRICS.inc("retries_total")
+        waited = time.perf_counter()
+        (limiter or DEFAULT_LIMITER).acquire()
+        started = time.perf_counter()
+        METRICS.inc("limiter_wait_seconds_total", started - waited)
+        METRICS.inc("requests_total")
+        delay = None
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout, stream=True)
+            body, transferred = read_body(response)
+        except (requests.ConnectionError, requests.Timeout, urllib3.exceptions.HTTPError, LuoguRequestError) as e:
+            METRICS.inc("request_errors_total")
+            last_error = e
+        else:
+            METRICS.observe("request_latency_seconds", time.perf_counter() - started)
+            # 洛谷的响应经 gzip/br 压缩传输，分别统计实际传输的字节数和解压后的正文大小
+            METRICS.inc("response_bytes_total", transferred)
+            METRICS.inc("response_decoded_bytes_total", len(body))
+            if response.status_code == 304 and cached:
+                METRICS.inc("cache_revalidated_total")
+                cache.touch(key, cached[0])
+                return loads(cached[1])
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                parse_started = time.perf_counter()
+                data = loads(body)
+                METRICS.add_phase("parse", time.perf_counter() - parse_started)
+                if check_code and data.get('code', 0) != 200:
+                    error_msg = data.get('currentData', {}).get('errorMessage', '未知错误')
+                    raise LuoguRequestError(f"API错误: {error_msg}", data.get('code'))
+                if cache is not None:
+                    cache.put(key, body, {
+                        "url": url,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    })
+                return data
+            METRICS.inc("request_errors_total")
+            last_error = LuoguRequestError(f"HTTP {response.status_code}")
+            delay = retry_after_seconds(response)
+
+        if attempt < retries:
+            time.sleep(delay if delay is not None else backoff_delay(attempt))
+
+    raise LuoguRequestError(f"重试 {retries} 次后仍然失败: {last_error}")
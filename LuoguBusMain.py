@@ -1,317 +1,1109 @@
-import requests
-import time
-import sys
-import json
-import csv
-from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-
-
-def fetch_luogu_submissions(luogu_uid, client_id, count=50):
-    """获取洛谷提交记录，确保获取最新记录并按时间升序排列"""
-    url = "https://www.luogu.com.cn/record/list"
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
-        "Referer": f"https://www.luogu.com.cn/user/{luogu_uid}",
-        "Cookie": f"__client_id={client_id}; _uid={luogu_uid}",
-        "X-Luogu-Type": "content-only",
-        "X-Requested-With": "XMLHttpRequest"
-    }
-
-    all_records = []
-    page = 1
-    per_page = 20  # 洛谷每页固定返回20条记录
-    total_needed = count
-
-    try:
-        # 计算需要抓取的页数（向上取整）
-        pages_needed = (total_needed + per_page - 1) // per_page
-
-        # 从第一页开始获取最新记录
-        while len(all_records) < total_needed and page <= pages_needed:
-            params = {
-                "user": luogu_uid,
-                "page": page,
-                "_contentOnly": 1
-            }
-
-            response = requests.get(url, headers=headers, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get('code', 0) != 200:
-                error_msg = data.get('currentData', {}).get('errorMessage', '未知错误')
-                print(f"第 {page} 页API错误: {error_msg}")
-                break
-
-            records = data['currentData']['records']['result']
-            if not records:
-                break  # 没有更多记录了
-
-            # 将本页记录按时间升序排列后添加到总列表
-            records.sort(key=lambda x: x['submitTime'])
-            all_records.extend(records)
-
-            # 显示进度
-            print(f"已获取第 {page} 页，共 {len(records)} 条记录")
-
-            # 如果已经获取到足够数量的记录
-            if len(all_records) >= total_needed:
-                break
-
-            page += 1  # 获取下一页
-            time.sleep(0.2)
-
-        # 按时间升序排序（越早的记录越靠前）
-        all_records.sort(key=lambda x: x['submitTime'])
-
-        # 确保不超过请求的数量（取最新的count条）
-        return all_records[-min(total_needed, len(all_records)):]
-    except Exception as e:
-        print(f"获取数据失败: {str(e)}")
-        return []
-
-
-def create_excel(records, filename):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "刷题记录"
-
-    # 设置列宽
-    column_widths = {
-        'A': 20, 'B': 15, 'C': 40,
-        'D': 10, 'E': 15, 'F': 15
-    }
-    for col, width in column_widths.items():
-        ws.column_dimensions[col].width = width
-
-    # 表头样式
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                         top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # 写入表头
-    headers = [
-        "提交日期", "题号", "题目名称", "状态", "运行时间", "内存占用"
-    ]
-    ws.append(headers)
-
-    # 应用表头样式
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = alignment
-        cell.border = thin_border
-
-    # 数据样式
-    data_alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
-
-    status_colors = {
-        "AC": "32CD32",
-        "WA": "FF0000",
-        "TLE": "191970",
-        "MLE": "191970",
-        "RE": "A020F0",
-        "CE": "DAA520",
-        "UnAccept": "FF0000",
-        "UKE": "191970"
-    }
-
-    status_mapping = {
-        12: "AC",
-        7: "WA",
-        4: "TLE",
-        5: "MLE",
-        6: "RE",
-        2: "CE",
-        14: "UnAccept",
-        11: "UKE",
-        21: "Waiting",
-        3: "OLE",
-        1: "Judging"
-    }
-
-    # 写入数据
-    for record in records:
-        submit_time = datetime.fromtimestamp(record['submitTime'])
-        problem = record.get('problem', {})
-
-        status_code = record.get('status', 0)
-        status = status_mapping.get(status_code, f"未知({status_code})")
-
-        row = [
-            submit_time.strftime("%Y-%m-%d %H:%M"),
-            problem.get('pid', '未知'),
-            problem.get('title', '未知'),
-            status,
-            f"{record.get('time', 0)}ms",
-            f"{record.get('memory', 0)}KB",
-        ]
-        ws.append(row)
-
-        last_row = ws.max_row
-        for col in range(1, 7):  # 共6列
-            cell = ws.cell(row=last_row, column=col)
-            cell.alignment = data_alignment
-            cell.border = thin_border
-
-            if col == 4 and status in status_colors:
-                cell.fill = PatternFill(
-                    start_color=status_colors[status],
-                    end_color=status_colors[status],
-                    fill_type="solid"
-                )
-                cell.font = Font(color="FFFFFF")
-
-    ws.freeze_panes = "A2"
-
-    wb.save(filename)
-    print(f"✓ 已生成Excel文件: {filename}")
-
-
-def create_csv(records, filename):
-    """创建CSV文件"""
-    if not records:
-        return
-
-    fieldnames = [
-        "submit_time", "problem_id", "problem_name", "status", "run_time", "memory_usage"
-    ]
-
-    status_mapping = {
-        12: "AC",
-        7: "WA",
-        4: "TLE",
-        5: "MLE",
-        6: "RE",
-        2: "CE",
-        14: "UnAccept",
-        11: "UKE",
-        21: "Waiting",
-        3: "OLE",
-        1: "Judging"
-    }
-
-    # 准备数据
-    data = []
-    for record in records:
-        submit_time = datetime.fromtimestamp(record['submitTime'])
-        problem = record.get('problem', {})
-
-        status_code = record.get('status', 0)
-        status = status_mapping.get(status_code, f"Unknown({status_code})")
-
-        data.append({
-            "submit_time": submit_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "problem_id": problem.get('pid', 'Unknown'),
-            "problem_name": problem.get('title', 'Unknown'),
-            "status": status,
-            "run_time": record.get('time', 0),
-            "memory_usage": record.get('memory', 0)
-        })
-
-    # 写入CSV
-    with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
-
-    print(f"✓ 已生成CSV文件: {filename}")
-
-
-def main():
-    banner = f"""
-                ██╗     ██╗   ██╗ ██████╗  ██████╗ ██╗   ██╗
-                ██║     ██║   ██║██╔═══██╗██╔════╝ ██║   ██║
-                ██║     ██║   ██║██║   ██║██║  ███╗██║   ██║
-                ██║     ██║   ██║██║   ██║██║   ██║██║   ██║  
-                ███████╗╚██████╔╝╚██████╔╝╚██████╔╝╚██████╔╝
-                ╚══════╝ ╚═════╝  ╚═════╝  ╚═════╝  ╚═════╝
-                ██████╗ ██╗   ██╗███████╗
-                ██╔══██╗██║   ██║██╔════╝
-                ██████╔╝██║   ██║███████╗
-                ██╔══██╗██║   ██║╚════██║
-                ██████╔╝╚██████╔╝███████║
-                ╚═════╝  ╚═════╝ ╚══════╝
-            """
-    print(banner)
-    print("洛谷做题日记生成器 v3.9.5")
-
-    client_id = input("请输入__client_id的值: ").strip()
-    luogu_uid = input("请输入_uid的值: ").strip()
-
-    while True:
-        try:
-            count_input = input("请输入要获取的记录数量 (1-1000, 默认50): ").strip()
-            if not count_input:
-                count = 50
-                break
-
-            count = int(count_input)
-            if 1 <= count <= 2000:
-                break
-            else:
-                print("请输入1到2000之间的整数！")
-        except ValueError:
-            print("请输入有效的整数！")
-
-    if not client_id or not luogu_uid:
-        print("错误: 必须提供Cookie信息")
-        sys.exit(1)
-
-    # 获取提交记录
-    print(f"\n正在获取用户 {luogu_uid} 的最新 {count} 条提交记录...")
-    records = fetch_luogu_submissions(luogu_uid, client_id, count)
-
-    if not records:
-        print("获取提交记录失败，请检查：")
-        print("1. Cookie信息是否正确（需包含__client_id和_uid）")
-        print("2. 账号是否有公开提交记录")
-        sys.exit(1)
-
-    actual_count = len(records)
-    if actual_count < count:
-        print(f"⚠️ 注意: 只获取到 {actual_count} 条记录（请求数量: {count}）")
-    else:
-        print(f"✅ 成功获取 {actual_count} 条提交记录")
-        # 显示时间范围
-        first_submit = datetime.fromtimestamp(records[0]['submitTime']).strftime("%Y-%m-%d %H:%M")
-        last_submit = datetime.fromtimestamp(records[-1]['submitTime']).strftime("%Y-%m-%d %H:%M")
-        print(f"📅 时间范围: {first_submit} 至 {last_submit}")
-
-    # 生成文件名
-    timestamp = time.strftime('%Y%m%d_%H%M%S')
-    base_filename = f"Luogu_Diary_{luogu_uid}_{timestamp}"
-
-    # 生成两种格式文件
-    create_excel(records, f"{base_filename}.xlsx")
-    create_csv(records, f"{base_filename}.csv")
-
-    # 使用提示
-    print("\n使用说明:")
-    print(f"1. Excel文件 ({base_filename}.xlsx):")
-    print("   - 状态颜色与洛谷官网完全一致")
-    print("   - 表格按提交时间升序排列（最早的在最上面）")
-    print(f"2. CSV文件 ({base_filename}.csv):")
-    print("   - 纯文本格式，适合程序处理")
-    print(f"3. 包含 {actual_count} 条记录，时间从 {first_submit} 到 {last_submit}")
-    print("\n提示：避免频繁请求大量数据，以防被洛谷IPBan！")
-
-
-if __name__ == "__main__":
-    try:
-        import openpyxl
-    except ImportError:
-        print("错误: 需要安装openpyxl库，请执行: pip install openpyxl")
-        sys.exit(1)
-    try:
-        import requests
-    except ImportError:
-        print("错误: 需要安装requests库，请执行: pip install requests")
-        sys.exit(1)
-
-    main()
+import argparse
+import importlib.util
+import os
+import time
+import sys
+import csv
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from LuoguBusExport import (DEFAULT_FORMATS, EXPORTERS, SHARD_PERIODS, CombinedCsvDiaryWriter, export_diary,
+                            export_records, open_appenders, parse_formats, uses_problem_meta, worth_parallel)
+from LuoguBusHttp import FairScheduler, ResponseCache, account_headers, get_json, is_not_found
+from LuoguBusMetrics import METRICS, profiled
+from LuoguBusRecord import PENDING_STATUS, RecordFilter, Submission, parse_statuses
+from LuoguBusSources import SOURCE_DIR, SourceArchive
+from LuoguBusStore import BackfillCheckpoint, SubmissionStore, SyncSpan, merge_spans, record_key
+
+
+RECORD_LIST_PATH = "/record/list"
+DB_FILE = "LuoguBus.db"
+CACHE_DIR = ".luogubus_cache"  # record/list 响应的磁盘缓存目录
+FETCH_WORKERS = 4  # 同时进行中的页面请求数
+DEFAULT_PER_PAGE = 20  # 响应中没有 perPage 时按洛谷的默认每页条数
+PROBLEM_TTL = 30 * 24 * 3600  # 题目难度、标签很少变化，本地缓存30天
+PROBLEM_BATCH = 20  # 每批补全的题目数
+SOURCE_BATCH = 20  # 每批归档的源代码数
+CHECKPOINT_DIR = ".luogubus_checkpoints"  # 回填检查点目录，每个账号一个文件
+WATCH_MIN_INTERVAL = 30.0  # 监视模式：有新提交时的轮询间隔（秒）
+WATCH_MAX_INTERVAL = 1800.0  # 监视模式：长时间没有新提交时的最长轮询间隔（秒）
+
+# 一页提交记录，以及接口同时返回的记录总数和每页条数
+RecordPage = namedtuple("RecordPage", ["records", "count", "per_page"])
+
+
+def fetch_record_listing(luogu_uid, client_id, page, limiter=None, cache=None, filters=None):
+    """获取一页提交记录（洛谷按时间倒序返回，最新的在第一页），失败时自动重试；filters 中服务器支持的条件作为查询参数
+
+    返回 RecordPage：本页记录，以及接口报告的记录总数（没有时为 None）和每页条数
+    """
+    params = {
+        "user": luogu_uid,
+        "page": page,
+        "_contentOnly": 1
+    }
+    if filters:
+        params.update(filters.params())
+
+    data = get_json(RECORD_LIST_PATH, params=params, headers=account_headers(luogu_uid, client_id),
+                    limiter=limiter, cache=cache)
+    listing = data['currentData']['records']
+    records = [Submission.from_json(record) for record in listing['result']]
+    METRICS.inc("records_fetched_total", len(records))
+    return RecordPage(records, listing.get('count'), listing.get('perPage') or DEFAULT_PER_PAGE)
+
+
+def scan_record_pages(luogu_uid, client_id, filters, workers=FETCH_WORKERS, limiter=None, cache=None):
+    """从最新一页开始逐页产出符合 filters 的记录，翻到早于 filters.since 的记录或最后一页时停止；
+    有页面重试后仍获取失败时抛出该异常，已产出的记录不完整
+
+    时间窗口较窄时往往一两页就结束，所以在途请求数从1开始，每取回一页翻倍，最多 workers 个
+    """
+    pending = deque()
+    next_page = 1
+    window = 1
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        try:
+            while True:
+                while len(pending) < window:
+                    pending.append((next_page, executor.submit(
+                        fetch_record_listing, luogu_uid, client_id, next_page, limiter, cache, filters)))
+                    next_page += 1
+                page, future = pending.popleft()
+                try:
+                    listing = future.result()
+                except Exception as e:
+                    # 中间缺页时无法判断是否已翻出时间窗口，不再继续
+                    print(f"第 {page} 页获取失败，停止翻页: {str(e)}")
+                    raise
+                records = listing.records
+                if not records:
+                    return  # 没有更多记录了
+                print(f"已获取第 {page} 页，共 {len(records)} 条记录")
+                yield [record for record in records if filters.matches(record)]
+                if len(records) < listing.per_page or filters.reached_end(records):
+                    return
+                window = min(window * 2, max(1, workers))
+        finally:
+            # 提前结束时取消还没开始的请求
+            for _, future in pending:
+                future.cancel()
+
+
+def fetch_filtered_submissions(luogu_uid, client_id, filters, count=None, workers=FETCH_WORKERS, limiter=None,
+                               cache=None):
+    """按筛选条件获取最新的count条记录（count 为 None 时取时间窗口内的全部），按时间升序返回；
+    有页面获取失败时抛出异常，不返回不完整的结果
+    """
+    matched = []
+    seen = set()
+    for records in scan_record_pages(luogu_uid, client_id, filters, workers, limiter, cache):
+        for record in records:
+            # 翻页过程中有新提交时页面边界会后移，同一条记录可能出现两次
+            if record.id not in seen:
+                seen.add(record.id)
+                matched.append(record)
+        if count is not None and len(matched) >= count:
+            break
+    matched.sort(key=lambda x: x.submit_time)
+    return matched[-count:] if count is not None else matched
+
+
+# 抓取计划：先取第一页，按接口报告的记录总数和每页条数确定要请求的页
+# 以第一页时的记录列表为快照，第 i 新的记录位置为 i；翻页期间有新提交时后面的页整体后移，
+# 每页按自己响应中的记录总数换算回快照位置，重复的记录按ID去重，漏掉的位置只补取所在的边界页
+class FetchPlanner:
+    max_refetch = 3  # 每个缺口最多补取的次数
+
+    def __init__(self, luogu_uid, client_id, count=50, limiter=None, cache=None, checkpoint=None):
+        self.luogu_uid = luogu_uid
+        self.client_id = client_id
+        self.count = count
+        self.limiter = limiter
+        self.cache = cache
+        self.checkpoint = checkpoint  # BackfillCheckpoint，每完成一页就保存，可从中断处继续
+        self.total = None  # 第一页报告的记录总数
+        self.per_page = DEFAULT_PER_PAGE
+        self.target = 0  # 要获取的快照位置范围 [0, target)
+        self.pages = 0
+        self.shift = 0  # 最近一次响应相对快照的偏移（新增的记录数）
+        self.low = 0  # 只获取快照位置 [low, target) 的记录，位置更小的已在别处取到
+        self.requested = 0
+        self.complete = True  # 目标范围内的记录是否全部获取到
+        self.lock = threading.Lock()  # 并发请求的各页共用 shift 和 requested
+
+    def set_plan(self, total, per_page):
+        self.total = total
+        self.per_page = per_page
+        self.target = self.count if total is None else min(self.count, total)
+        self.pages = (self.target + per_page - 1) // per_page
+
+    def start(self):
+        """请求第一页并确定计划，返回第一页的定位结果；账号没有记录或请求失败时返回 None"""
+        try:
+            listing = fetch_record_listing(self.luogu_uid, self.client_id, 1, self.limiter, self.cache)
+        except Exception as e:
+            print(f"第 1 页获取失败: {str(e)}")
+            self.complete = False
+            return None
+        self.requested += 1
+        if not listing.records:
+            return None
+        located = self.begin(listing)
+        if self.total is not None:
+            print(f"共有 {self.total} 条提交记录，需要请求 {self.pages} 页")
+        print(f"已获取第 1 页，共 {len(listing.records)} 条记录")
+        return located
+
+    def begin(self, listing):
+        """以已取到的第一页为快照确定计划，返回第一页的定位结果"""
+        self.set_plan(listing.count, listing.per_page)
+        if self.checkpoint is not None:
+            self.checkpoint.start({"uid": str(self.luogu_uid), "count": self.count, "total": self.total,
+                                   "per_page": self.per_page})
+            self.checkpoint.save_page(1, listing.count, listing.records)
+        return self.locate(1, listing)
+
+    def resume(self):
+        """从检查点恢复同一账号、同一数量的计划，返回 (已完成页面的定位结果列表, 已完成的页码集合)，不能恢复时都为空"""
+        if self.checkpoint is None:
+            return [], set()
+        plan, entries = self.checkpoint.load()
+        if not plan or plan.get("uid") != str(self.luogu_uid) or plan.get("count") != self.count \
+                or not any(page == 1 for page, _, _ in entries):
+            return [], set()
+        self.set_plan(plan["total"], plan["per_page"])
+        located = [self.locate(page, RecordPage(records, count, self.per_page)) for page, count, records in entries]
+        return located, {page for page, _, _ in entries}
+
+    def locate(self, page, listing):
+        """换算一页记录在快照中的位置，返回 (起始位置, 结束位置, [(位置, 记录), ...])，只保留目标范围内的记录"""
+        # 各页按自己响应中的记录总数定位；没有总数时沿用最近一次的偏移
+        with self.lock:
+            if listing.count is not None and self.total is not None:
+                self.shift = shift = listing.count - self.total
+            else:
+                shift = self.shift
+        start = (page - 1) * self.per_page - shift
+        positioned = [(start + index, record) for index, record in enumerate(listing.records)
+                      if self.low <= start + index < self.target]
+        return start, start + len(listing.records), positioned
+
+    def fetch(self, page):
+        """请求并定位一页，失败时返回 None（留下的缺口由 fill 补取）"""
+        try:
+            listing = fetch_record_listing(self.luogu_uid, self.client_id, page, self.limiter, self.cache)
+        except Exception as e:
+            print(f"第 {page} 页获取失败: {str(e)}")
+            return None
+        with self.lock:
+            self.requested += 1
+        if self.checkpoint is not None:
+            self.checkpoint.save_page(page, listing.count, listing.records)
+        print(f"已获取第 {page} 页，共 {len(listing.records)} 条记录")
+        return self.locate(page, listing)
+
+    def gaps(self, spans):
+        """已请求的页覆盖的快照区间 [(起始, 结束), ...] 中，目标范围内没有覆盖到的区间"""
+        gaps = []
+        position = self.low
+        for start, end in sorted(spans):
+            if start > position:
+                gaps.append((position, min(start, self.target)))
+            position = max(position, end)
+            if position >= self.target:
+                break
+        if position < self.target:
+            gaps.append((position, self.target))
+        return [(start, end) for start, end in gaps if start < end]
+
+    def fill(self, start, end):
+        """按最新的偏移补取快照位置 [start, end) 所在的页，返回补到的 [(位置, 记录), ...]"""
+        found = []
+        for _ in range(self.max_refetch + (end - start) // self.per_page):
+            if start >= end:
+                break
+            page = max(1, (start + self.shift) // self.per_page + 1)
+            print(f"翻页期间记录有变化，补取第 {page} 页")
+            located = self.fetch(page)
+            if located is None:
+                continue
+            page_start, page_end, positioned = located
+            if page_start == page_end:
+                break  # 已经没有更多记录
+            found.extend(item for item in positioned if start <= item[0] < end)
+            if page_start <= start < page_end:
+                start = page_end
+            # 否则边界又移动了，按新的偏移重试
+        if start < end and self.total is not None:
+            print(f"⚠️ 快照中第 {start + 1} 到 {end} 条记录未能获取")
+            self.complete = False
+        return found
+
+    def run(self, workers=FETCH_WORKERS):
+        """按计划获取全部页面（有检查点时跳过已完成的页面）并补齐缺口，返回按时间升序的记录"""
+        located, done = self.resume()
+        if located:
+            print(f"从检查点恢复了 {len(done)} 页，共 {self.pages} 页")
+        else:
+            first = self.start()
+            if first is None:
+                return []
+            located, done = [first], {1}
+        return self.collect(located, done, workers)
+
+    def collect(self, located, done, workers=FETCH_WORKERS):
+        """并发请求计划中 done 以外的页面并补齐缺口，与已定位的页面 located 合并，返回按时间升序的记录"""
+        # 其余页面并发请求，请求频率由共享的令牌桶控制；单页失败只留下缺口，之后补取
+        remaining = [page for page in range(max(2, self.low // self.per_page + 1), self.pages + 1) if page not in done]
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(remaining))))
+        try:
+            for result in executor.map(self.fetch, remaining):
+                if result is not None:
+                    located.append(result)
+        finally:
+            # 中断时取消还没开始的请求，已完成的页面都已保存在检查点中
+            executor.shutdown(cancel_futures=True)
+
+        records = {}
+        for _, _, positioned in located:
+            for _, record in positioned:
+                records[record.id] = record
+        for start, end in self.gaps([(start, end) for start, end, _ in located]):
+            for _, record in self.fill(start, end):
+                records[record.id] = record
+
+        if self.checkpoint is not None and self.complete:
+            self.checkpoint.clear()
+        # 按时间升序排序（越早的记录越靠前）
+        return sorted(records.values(), key=lambda x: (x.submit_time, x.id))
+
+
+def fetch_luogu_submissions(luogu_uid, client_id, count=50, workers=FETCH_WORKERS, limiter=None, cache=None,
+                            filters=None, checkpoint=None):
+    """获取洛谷提交记录，确保获取最新记录并按时间升序排列；指定 filters 时只获取符合条件的记录，
+    指定 checkpoint（BackfillCheckpoint）时每完成一页就保存，中断后再次调用从检查点继续
+    """
+    if filters:
+        return fetch_filtered_submissions(luogu_uid, client_id, filters, count, workers, limiter, cache)
+
+    return FetchPlanner(luogu_uid, client_id, count, limiter, cache, checkpoint).run(workers)
+
+
+def iter_luogu_submissions(luogu_uid, client_id, count=50, workers=FETCH_WORKERS, limiter=None, cache=None,
+                           filters=None):
+    """fetch_luogu_submissions 的流式版本：逐页产出最新的count条记录，整体按时间升序，无需全局排序"""
+    if filters:
+        # 筛选后的页数事先无法确定，只能从最新一页向前翻，取完后再按时间升序产出
+        yield from fetch_filtered_submissions(luogu_uid, client_id, filters, count, workers, limiter, cache)
+        return
+
+    # 先取第一页（最新的记录）确定计划，再从最早的一页开始向新的方向产出
+    planner = FetchPlanner(luogu_uid, client_id, count, limiter, cache)
+    first = planner.start()
+    if first is None:
+        return
+    seen = set()
+    low = planner.target  # 已产出部分在快照中的最小位置
+
+    def emit(located):
+        nonlocal low
+        start, end, positioned = located
+        # 与已产出的更早部分之间有缺口时先补取（缺口中的记录更早，先产出）
+        if end < low:
+            positioned = planner.fill(end, low) + positioned
+        # 快照位置越大越早
+        for position, record in sorted(positioned, key=lambda item: -item[0]):
+            if position < low and record.id not in seen:
+                seen.add(record.id)
+                yield record
+        low = min(low, start)
+
+    # 最多 workers 个页面同时在途，按从旧到新的顺序依次产出
+    older_pages = range(planner.pages, 1, -1)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = deque()
+        pages = iter(older_pages)
+        for page in pages:
+            pending.append(executor.submit(planner.fetch, page))
+            if len(pending) >= workers:
+                break
+        while pending:
+            future = pending.popleft()
+            next_page = next(pages, None)
+            if next_page is not None:
+                pending.append(executor.submit(planner.fetch, next_page))
+
+            located = future.result()
+            if located is not None:
+                yield from emit(located)
+
+    yield from emit(first)
+
+
+# 增量同步：本地库为每个账号保存一段从最新记录开始、中间没有缺口的区间（SyncSpan），导出只读取这段区间
+# 从最新一页开始翻页，直到接上上次的区间才算完成（不会因为取够count条就停下而在中间留下缺口）；
+# 区间内不足count条时，再从区间下界所在的页继续向更早翻
+class IncrementalSync:
+    per_page = DEFAULT_PER_PAGE  # 之后按响应中的 perPage 更新
+    max_locate = 3  # 跳到区间下界所在的页后，因页面偏移找不到下界时最多重新定位的次数
+
+    def __init__(self, luogu_uid, client_id, store, count=50, limiter=None, cache=None):
+        self.luogu_uid = luogu_uid
+        self.client_id = client_id
+        self.store = store
+        self.count = count
+        self.limiter = limiter
+        self.cache = cache
+        self.span = store.sync_span(luogu_uid)  # 上次同步后的连续区间，从未同步过时为 None
+        self.page = 1
+        self.requested = 0
+        self.new_count = 0
+        self.first = None  # 本次同步的第一页，并发获取时作为快照
+        self.total = None  # 第一页报告的记录总数
+        self.top = None  # 本次从第一页起连续取到的最新、最早记录的排序键
+        self.bottom = None
+        self.fetched = set()
+        self.joined = False  # 是否已接上上次的区间（或建立了新的区间），之后只需向更早扩展
+        self.located = False  # 向更早扩展时，当前页是否紧接在区间下界之后
+        self.locating = 0
+        self.done = False
+
+    def step(self):
+        """请求并保存一页，返回是否还需要继续翻页"""
+        try:
+            listing = fetch_record_listing(self.luogu_uid, self.client_id, self.page, self.limiter, self.cache)
+        except Exception as e:
+            print(f"[{self.luogu_uid}] 同步数据失败: {str(e)}")
+            return self.finish()
+        records = listing.records
+        self.per_page = listing.per_page
+        self.requested += 1
+        if self.page == 1:
+            self.first = listing
+            self.total = listing.count
+        last = len(records) < self.per_page  # 最后一页
+
+        if self.joined:
+            return self.extend(records, last)
+        new_count = self.absorb(records, last)
+        print(f"[{self.luogu_uid}] 已同步第 {self.page} 页，新增 {new_count} 条记录")
+        if not self.joined:
+            if last:
+                return self.finish()  # 账号没有记录
+            self.page += 1
+            return True
+        return self.advance()
+
+    def save(self, records):
+        """整页写入（顺带刷新仍在评测中的记录状态），返回新增的条数"""
+        known = self.store.known_ids(self.luogu_uid, [record.id for record in records])
+        self.store.add_records(self.luogu_uid, records)
+        self.new_count += len(records) - len(known)
+        return len(records) - len(known)
+
+    def absorb(self, records, last):
+        """保存从第一页起连续取到的记录；接上上次的区间、或第一次同步取够count条时建立新的区间，返回新增的条数"""
+        new_count = self.save(records)
+        keys = [record_key(record) for record in records]
+        if not keys:
+            return new_count
+        self.top = max(keys + [self.top] if self.top else keys)
+        self.bottom = min(keys + [self.bottom] if self.bottom else keys)
+        self.fetched.update(record.id for record in records)
+
+        span = self.span
+        if span is not None and any(span.floor <= key <= span.top for key in keys):
+            # 取到了上次区间内的记录：本次取到的记录与上次的区间连成一段
+            self.join(SyncSpan(self.top, min(span.floor, self.bottom), span.complete, self.total))
+        elif last or (span is None and len(self.fetched) >= self.count):
+            # 第一次同步取够了记录，或已翻到账号最早的记录：取到的记录本身就是一段连续区间
+            self.join(SyncSpan(self.top, self.bottom, last, self.total))
+        return new_count
+
+    def join(self, span):
+        self.located = span.floor == self.bottom  # 区间下界就是刚取到的最后一条，下一页紧接其后
+        self.span = span
+        self.joined = True
+        self.store.save_sync_span(self.luogu_uid, span)
+
+    def need_more(self):
+        return not self.span.complete and self.store.span_count(self.luogu_uid) < self.count
+
+    def advance(self):
+        """区间内记录不够时准备向更早扩展：下一页紧接区间下界时顺序翻页，否则跳到下界所在的页（区间内没有缺口，页码可按条数算出）"""
+        if not self.need_more():
+            return self.finish()
+        if self.located:
+            self.page += 1
+        else:
+            self.page = (self.store.span_count(self.luogu_uid) - 1) // self.per_page + 1
+        return True
+
+    def extend(self, records, last):
+        """区间向更早扩展一页：跳页后须先在页中找到区间下界，确认衔接后下界之后的记录接到区间末尾"""
+        span = self.span
+        keys = [record_key(record) for record in records]
+        if self.located:
+            # 翻页期间有新提交时页面整体后移，会重复取到区间内的记录
+            records = [record for record, key in zip(records, keys) if key < span.floor]
+        elif span.floor in keys:
+            records = records[keys.index(span.floor) + 1:]
+            self.located = True
+        elif keys and self.locating < self.max_locate and (min(keys) > span.floor or max(keys) < span.floor):
+            # 新提交使页面后移（或有记录被删除使页面前移），下界不在这一页，换一页重新定位
+            self.locating += 1
+            self.page = self.page + 1 if min(keys) > span.floor else max(1, self.page - 1)
+            return True
+        else:
+            print(f"[{self.luogu_uid}] ⚠️ 没能找到本地连续记录的衔接位置，停止向更早同步")
+            return self.finish()
+
+        new_count = self.save(records)
+        floor = min([record_key(record) for record in records], default=span.floor)
+        self.join(SyncSpan(span.top, floor, last, span.total))
+        self.located = True
+        print(f"[{self.luogu_uid}] 已同步第 {self.page} 页，新增 {new_count} 条记录")
+        if last:
+            return self.finish()
+        return self.advance()
+
+    def prefetch(self, workers):
+        """第一页之后需要连续获取的多页交给 FetchPlanner 并发请求（共享令牌桶限速），返回是否还需要逐页继续
+
+        还没接上上次的区间时，按两次第一页报告的记录总数之差估计新增的条数，一次取到上次区间的最新记录；
+        已接上但区间内不足count条时，从区间下界所在的位置一次取到第count条。估计不足的部分之后仍逐页获取
+        """
+        if self.first is None or self.total is None:
+            return True
+        if not self.joined:
+            if self.span is None:
+                target = self.count
+            elif self.span.total is not None:
+                # 上次区间的最新记录现在大约排在第 新增条数+1 位，多取一页以防有记录被删除
+                target = self.total - self.span.total + 1 + self.per_page
+            else:
+                return True
+            records, planner = self.fetch_planned(target, self.per_page, workers)
+            if records is None:
+                return self.finish()
+            self.absorb(records, planner.target >= self.total)
+            if not self.joined:
+                self.page = planner.pages + 1
+                return True
+            if not self.need_more():
+                return self.finish()
+            if self.located:
+                self.page = planner.pages + 1
+                return True
+
+        # 区间内没有缺口，区间下界在快照中的位置就是区间内的条数减一；从下界开始取，用来确认衔接
+        span = self.span
+        records, planner = self.fetch_planned(self.count, self.store.span_count(self.luogu_uid) - 1, workers)
+        keys = [record_key(record) for record in records or []]
+        if span.floor not in keys:
+            # 请求失败或没能确认衔接，回到逐页定位
+            self.located = False
+            return self.advance()
+        older = [record for record, key in zip(records, keys) if key < span.floor]
+        self.save(older)
+        self.join(SyncSpan(span.top, min(keys), planner.target >= self.total, span.total))
+        self.located = True
+        if self.span.complete or not self.need_more():
+            return self.finish()
+        self.page = planner.pages + 1
+        return True
+
+    def fetch_planned(self, target, low, workers):
+        """以第一页为快照并发获取位置 [low, target) 的记录，返回 (按时间升序的记录, 计划)；有页面没取到时记录为 None
+
+        target 向上取整到整页，取完后之后的逐页获取从下一页开始即可紧接其后
+        """
+        target = (target + self.per_page - 1) // self.per_page * self.per_page
+        planner = FetchPlanner(self.luogu_uid, self.client_id, target, self.limiter, self.cache)
+        first = planner.begin(self.first)
+        planner.low = low
+        if planner.target <= low:
+            return [], planner
+        print(f"[{self.luogu_uid}] 并发获取第 {low // self.per_page + 1} 到 {planner.pages} 页")
+        records = planner.collect([first], {1}, workers)
+        self.requested += planner.requested
+        if not planner.complete:
+            print(f"[{self.luogu_uid}] ⚠️ 有页面没能获取，本次同步取到的记录暂不使用")
+            return None, planner
+        return records, planner
+
+    def finish(self):
+        self.done = True
+        print(f"[{self.luogu_uid}] 本次同步新增 {self.new_count} 条记录，共请求 {self.requested} 页")
+        if self.span is not None and not self.joined and self.top is not None:
+            print(f"[{self.luogu_uid}] ⚠️ 没能接上上次同步的记录，本次取到的记录暂不导出，下次同步时继续")
+        return False
+
+    def run(self, workers=1):
+        """同步直到结束，返回新增的记录条数；workers 大于1时，第一页之后需要连续获取的多页并发请求，否则逐页请求"""
+        more = self.step()
+        if more and workers > 1:
+            more = self.prefetch(workers)
+        while more:
+            more = self.step()
+        return self.new_count
+
+
+def sync_luogu_store(luogu_uid, client_id, store, count=50, limiter=None, cache=None, workers=FETCH_WORKERS):
+    """增量同步到本地库，返回新增的记录条数"""
+    return IncrementalSync(luogu_uid, client_id, store, count, limiter, cache).run(workers)
+
+
+def backfill_store(luogu_uid, client_id, store, count=50, limiter=None, cache=None, checkpoint_dir=CHECKPOINT_DIR,
+                   workers=FETCH_WORKERS):
+    """回填最新的count条记录：每完成一页就写入检查点，中断后再次运行从上次完成的页面继续，
+    全部获取后才一次写入本地库，并与本地已有的连续区间合并；返回新增的记录条数，未完成时返回 None
+
+    回填的是开始时的快照，之后的新提交不在其中，需要再增量同步一次才能接上最新的记录
+    """
+    checkpoint = BackfillCheckpoint(os.path.join(checkpoint_dir, f"{luogu_uid}.ndjson"))
+    planner = FetchPlanner(luogu_uid, client_id, count, limiter, cache, checkpoint)
+    try:
+        records = planner.run(workers)
+    except KeyboardInterrupt:
+        print(f"\n已中断，已完成的页面保存在 {checkpoint.path}，再次使用 --backfill 运行即可继续")
+        raise
+    finally:
+        checkpoint.close()
+    if not planner.complete:
+        print(f"⚠️ 回填未完成，已完成的页面保存在 {checkpoint.path}，稍后再次使用 --backfill 运行即可继续")
+        return None
+    known = store.known_ids(luogu_uid, [record.id for record in records])
+    store.add_records(luogu_uid, records)
+    if records:
+        keys = [record_key(record) for record in records]
+        span = SyncSpan(max(keys), min(keys), planner.total is not None and planner.target >= planner.total,
+                        planner.total)
+        store.save_sync_span(luogu_uid, merge_spans(store.sync_span(luogu_uid), span))
+    print(f"[{luogu_uid}] 回填完成，新增 {len(records) - len(known)} 条记录")
+    return len(records) - len(known)
+
+
+def fetch_problem_meta(luogu_uid, client_id, pid, limiter=None):
+    """获取单道题目的难度和标签ID，返回 (pid, difficulty, [tag_id, ...])"""
+    data = get_json(f"/problem/{pid}", params={"_contentOnly": 1},
+                    headers=account_headers(luogu_uid, client_id), limiter=limiter)
+    problem = data['currentData']['problem']
+    return pid, problem.get('difficulty'), problem.get('tags') or []
+
+
+def enrich_problems(luogu_uid, client_id, store, pids, workers=FETCH_WORKERS, limiter=None):
+    """补全题目元数据：只请求本地没有或已过期的题号，去重后分批并发获取，返回 {pid: (难度, [标签名, ...])}"""
+    if not store.tag_count():
+        try:
+            data = get_json("/_lfe/tags", headers=account_headers(luogu_uid, client_id),
+                            limiter=limiter, check_code=False)
+            store.save_tag_names({tag['id']: tag['name'] for tag in data.get('tags', [])})
+        except Exception as e:
+            print(f"获取标签列表失败: {str(e)}")
+
+    def fetch_one(pid):
+        try:
+            return fetch_problem_meta(luogu_uid, client_id, pid, limiter)
+        except Exception as e:
+            print(f"获取题目 {pid} 信息失败: {str(e)}")
+            if is_not_found(e):
+                return pid, None, []  # 题目不存在或无权查看，记录下来，缓存期内不再重复请求
+            return None  # 超时、服务器错误、封禁等临时问题不保存，下次运行时重试
+
+    missing = store.stale_problems(pids, PROBLEM_TTL)
+    if missing:
+        print(f"正在补全 {len(missing)} 道题目的难度和标签...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for start in range(0, len(missing), PROBLEM_BATCH):
+                store.save_problems([item for item in executor.map(fetch_one, missing[start:start + PROBLEM_BATCH])
+                                     if item])
+
+    return store.problem_meta(pids)
+
+
+def diary_problems(luogu_uid, client_id, store, pids, formats, enrich=True, workers=FETCH_WORKERS, limiter=None):
+    """导出所需的题目元数据；关闭了补全（--no-enrich）或所选格式都没有难度、标签列时不发请求，返回 None"""
+    if not enrich or not uses_problem_meta(formats):
+        return None
+    with METRICS.phase("enrich"):
+        return enrich_problems(luogu_uid, client_id, store, pids, workers, limiter)
+
+
+def fetch_record_source(luogu_uid, client_id, rid, limiter=None):
+    """获取一条提交记录的源代码，没有权限查看时返回 None"""
+    data = get_json(f"/record/{rid}", params={"_contentOnly": 1},
+                    headers=account_headers(luogu_uid, client_id), limiter=limiter)
+    return (data['currentData'].get('record') or {}).get('sourceCode')
+
+
+def archive_sources(luogu_uid, client_id, store, archive, rids, workers=FETCH_WORKERS, limiter=None):
+    """归档提交记录的源代码：只请求以前没有归档过的记录，分批并发获取（共享请求限速），返回 {记录ID: 摘要}"""
+    rids = list(dict.fromkeys(rids))
+    digests = store.source_digests(rids)
+    # 归档文件被删除的记录也重新获取
+    missing = [rid for rid in rids if rid not in digests or (digests[rid] and not archive.exists(digests[rid]))]
+
+    def fetch_one(rid):
+        try:
+            source = fetch_record_source(luogu_uid, client_id, rid, limiter)
+        except Exception as e:
+            # 请求失败的记录不保存，下次运行时重试
+            print(f"获取记录 {rid} 的源代码失败: {str(e)}")
+            return None
+        return rid, archive.put(source) if source else ""
+
+    if missing:
+        print(f"正在归档 {len(missing)} 条记录的源代码...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for start in range(0, len(missing), SOURCE_BATCH):
+                fetched = [item for item in executor.map(fetch_one, missing[start:start + SOURCE_BATCH]) if item]
+                store.save_sources(fetched)
+                digests.update(fetched)
+                METRICS.inc("sources_fetched_total", len(fetched))
+    return digests
+
+
+def source_links(luogu_uid, client_id, store, archive, rids, base_filename):
+    """归档源代码并返回 {记录ID: 相对日记文件的源代码路径}；archive 为 None（未开启归档）时返回 None"""
+    if archive is None:
+        return None
+    with METRICS.phase("sources") as stats:
+        digests = archive_sources(luogu_uid, client_id, store, archive, rids)
+        stats["rows"] = len(digests)
+    return archive.links(digests, base_filename)
+
+
+def load_roster(filename):
+    """读取账号名单：每行 uid,client_id[,count]，#开头的行为注释"""
+    accounts = []
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            row = [value.strip() for value in row]
+            if not row or not row[0] or row[0].startswith('#') or row[0].lower() == 'uid':
+                continue
+            if len(row) < 2 or not row[1]:
+                print(f"⚠️ 跳过缺少__client_id的账号: {row[0]}")
+                continue
+            count = int(row[2]) if len(row) > 2 and row[2] else 50
+            accounts.append({"uid": row[0], "client_id": row[1], "count": min(max(count, 1), 2000)})
+    return accounts
+
+
+def run_batch(roster_file, formats=DEFAULT_FORMATS, workers=FETCH_WORKERS, limiter=None, cache=None,
+              db_file=DB_FILE, enrich=True):
+    """批量模式：所有账号共享同一个请求限速，按页轮转调度，生成每个人的日记和一份汇总CSV"""
+    accounts = load_roster(roster_file)
+    if not accounts:
+        print(f"错误: 账号名单 {roster_file} 中没有有效账号")
+        sys.exit(1)
+
+    print(f"共 {len(accounts)} 个账号，开始同步...")
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    started = time.time()
+
+    with SubmissionStore(db_file) as store:
+        jobs = [IncrementalSync(account["uid"], account["client_id"], store, account["count"], limiter, cache)
+                for account in accounts]
+        with METRICS.phase("fetch") as stats:
+            FairScheduler(workers).run(jobs)
+            stats["rows"] = sum(job.new_count for job in jobs)
+        print(f"同步完成，用时 {time.time() - started:.1f} 秒，共请求 {sum(job.requested for job in jobs)} 页")
+
+        # 所有账号涉及的题目合并去重后统一补全，同一道题只请求一次
+        pids = set()
+        for account in accounts:
+            pids.update(store.latest_pids(account["uid"], account["count"]))
+        first = accounts[0]
+        # 汇总CSV总是带难度、标签列
+        problems = diary_problems(first["uid"], first["client_id"], store, sorted(pids), list(formats) + ["csv"],
+                                  enrich, workers, limiter)
+
+        combined = CombinedCsvDiaryWriter(f"Luogu_Diary_batch_{timestamp}.csv")
+        for account in accounts:
+            luogu_uid = account["uid"]
+            if not store.count(luogu_uid):
+                print(f"⚠️ 账号 {luogu_uid} 没有获取到提交记录")
+                continue
+            base_filename = f"Luogu_Diary_{luogu_uid}_{timestamp}"
+            records = store.latest(luogu_uid, account["count"])
+            export_diary(records, base_filename, formats, worth_parallel(formats, len(records)), problems)
+            export_records(records, [combined.for_account(luogu_uid)], problems)
+        combined.close()
+
+
+def parse_time(text):
+    """解析时间参数：本地时间 YYYY-MM-DD[ HH:MM[:SS]]，或相对现在的天数如 7d，返回时间戳"""
+    text = text.strip()
+    if text[:-1].isdigit() and text[-1:].lower() == "d":
+        return int(time.time()) - int(text[:-1]) * 86400
+    return int(datetime.fromisoformat(text).timestamp())
+
+
+def parse_args(argv=None):
+    """命令行参数；账号信息和常用选项也可以通过环境变量提供，方便定时任务和服务使用"""
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="洛谷做题日记生成器：获取提交记录并生成刷题日记（不带参数时进入交互模式）")
+    parser.add_argument("--uid", default=env("LUOGU_UID"), help="洛谷 _uid（环境变量 LUOGU_UID）")
+    parser.add_argument("--client-id", default=env("LUOGU_CLIENT_ID"),
+                        help="洛谷 __client_id（环境变量 LUOGU_CLIENT_ID）")
+    parser.add_argument("--count", type=int, default=env("LUOGUBUS_COUNT"),
+                        help="要获取的记录数量，1-2000（环境变量 LUOGUBUS_COUNT，默认50）")
+    parser.add_argument("--formats", default=env("LUOGUBUS_FORMATS"),
+                        help=f"导出格式，逗号分隔，可选 {', '.join(EXPORTERS)}（环境变量 LUOGUBUS_FORMATS，默认 xlsx,csv）")
+    parser.add_argument("--output", help="输出文件名（不含扩展名），默认 Luogu_Diary_<uid>_<时间>，更新/监视模式下默认 Luogu_Diary_<uid>")
+    parser.add_argument("--db", default=env("LUOGUBUS_DB", DB_FILE), help=f"本地记录库路径（默认 {DB_FILE}）")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="不使用磁盘响应缓存")
+    parser.add_argument("--no-enrich", dest="enrich", action="store_false",
+                        default=env("LUOGUBUS_NO_ENRICH", "") in ("", "0"),
+                        help="不请求题目难度和标签（每道没缓存过的题目要单独请求一次），日记中这两列留空（环境变量 LUOGUBUS_NO_ENRICH=1）")
+    parser.add_argument("--workers", type=int, default=env("LUOGUBUS_WORKERS", FETCH_WORKERS),
+                        help=f"同时进行中的页面请求数，总请求频率仍受限速控制（环境变量 LUOGUBUS_WORKERS，默认 {FETCH_WORKERS}）")
+    parser.add_argument("--batch", metavar="ROSTER", help="批量模式：账号名单CSV，每行 uid,client_id[,count]")
+    parser.add_argument("--update", action="store_true",
+                        help="更新模式：在已有的日记文件（默认 Luogu_Diary_<uid>）末尾追加新记录，保留手写备注")
+    parser.add_argument("--watch", action="store_true", help="监视模式：持续轮询新提交，有变化时以更新模式追加到日记")
+    parser.add_argument("--min-interval", type=float, default=WATCH_MIN_INTERVAL,
+                        help=f"监视模式最短轮询间隔，秒（默认 {WATCH_MIN_INTERVAL:g}）")
+    parser.add_argument("--max-interval", type=float, default=WATCH_MAX_INTERVAL,
+                        help=f"监视模式空闲时最长轮询间隔，秒（默认 {WATCH_MAX_INTERVAL:g}）")
+    parser.add_argument("--since", help="只获取此时间及之后的记录：YYYY-MM-DD[ HH:MM] 或 7d（最近7天）")
+    parser.add_argument("--until", help="只获取此时间之前的记录（不含）：YYYY-MM-DD[ HH:MM] 或 Nd")
+    parser.add_argument("--status", help="只获取这些状态的记录，逗号分隔，如 AC 或 WA,TLE")
+    parser.add_argument("--pid", help="只获取这道题的记录，如 P1001")
+    parser.add_argument("--language", type=int, help="只获取该语言的记录（洛谷语言编号）")
+    parser.add_argument("--backfill", action="store_true",
+                        help=f"回填模式：不按增量同步，完整获取最新的count条记录，每完成一页写入检查点（{CHECKPOINT_DIR}），"
+                             "中断后再次运行从检查点继续")
+    parser.add_argument("--shard", choices=sorted(SHARD_PERIODS),
+                        help="Excel 按月(month)或年(year)拆分成多个工作簿并行生成，另附一个链接各分片的索引工作簿")
+    parser.add_argument("--sources", action="store_true",
+                        help="归档提交的源代码（相同内容只保存一份，已归档的不再下载），日记中链接到归档文件")
+    parser.add_argument("--source-dir", default=env("LUOGUBUS_SOURCE_DIR", SOURCE_DIR),
+                        help=f"源代码归档目录（环境变量 LUOGUBUS_SOURCE_DIR，默认 {SOURCE_DIR}）")
+    parser.add_argument("--metrics", metavar="PREFIX", default=env("LUOGUBUS_METRICS"),
+                        help="运行结束后输出指标到 PREFIX.json / PREFIX.prom（环境变量 LUOGUBUS_METRICS）")
+    parser.add_argument("--profile", metavar="PREFIX", default=env("LUOGUBUS_PROFILE"),
+                        help="用 cProfile/tracemalloc 分析运行过程，输出 PREFIX.prof / PREFIX.mem.txt（环境变量 LUOGUBUS_PROFILE）")
+    args = parser.parse_args(argv)
+
+    if args.count is not None and not 1 <= args.count <= 2000:
+        parser.error("--count 必须是1到2000之间的整数")
+    if not 1 <= args.workers <= 16:
+        parser.error("--workers 必须是1到16之间的整数")
+    if args.formats is not None:
+        try:
+            args.formats = parse_formats(args.formats)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.min_interval <= 0 or args.max_interval < args.min_interval:
+        parser.error("轮询间隔需满足 0 < --min-interval <= --max-interval")
+
+    try:
+        args.filters = RecordFilter(
+            since=parse_time(args.since) if args.since else None,
+            until=parse_time(args.until) if args.until else None,
+            statuses=parse_statuses(args.status) if args.status else None,
+            pid=args.pid.strip() if args.pid else None,
+            language=args.language,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if args.filters and (args.batch or args.update or args.watch):
+        parser.error("--since/--until/--status/--pid/--language 不能与 --batch/--update/--watch 同时使用")
+    if args.sources and args.batch:
+        parser.error("批量模式不支持 --sources")
+    if args.backfill and (args.batch or args.watch or args.filters):
+        parser.error("--backfill 不能与 --batch/--watch 或筛选条件同时使用")
+    if args.shard and (args.batch or args.update or args.watch):
+        parser.error("--shard 不能与 --batch/--update/--watch 同时使用")
+    return args
+
+
+def prompt_args(args):
+    """交互模式：命令行和环境变量没有提供的选项逐项询问"""
+    banner = f"""
+                ██╗     ██╗   ██╗ ██████╗  ██████╗ ██╗   ██╗
+                ██║     ██║   ██║██╔═══██╗██╔════╝ ██║   ██║
+                ██║     ██║   ██║██║   ██║██║  ███╗██║   ██║
+                ██║     ██║   ██║██║   ██║██║   ██║██║   ██║  
+                ███████╗╚██████╔╝╚██████╔╝╚██████╔╝╚██████╔╝
+                ╚══════╝ ╚═════╝  ╚═════╝  ╚═════╝  ╚═════╝
+                ██████╗ ██╗   ██╗███████╗
+                ██╔══██╗██║   ██║██╔════╝
+                ██████╔╝██║   ██║███████╗
+                ██╔══██╗██║   ██║╚════██║
+                ██████╔╝╚██████╔╝███████║
+                ╚═════╝  ╚═════╝ ╚══════╝
+            """
+    print(banner)
+    print("洛谷做题日记生成器 v3.9.5")
+
+    if not args.client_id:
+        args.client_id = input("请输入__client_id的值: ").strip()
+    if not args.uid:
+        args.uid = input("请输入_uid的值: ").strip()
+
+    while args.count is None and args.filters.since is None:
+        try:
+            count_input = input("请输入要获取的记录数量 (1-1000, 默认50): ").strip()
+            if not count_input:
+                args.count = 50
+                break
+
+            count = int(count_input)
+            if 1 <= count <= 2000:
+                args.count = count
+            else:
+                print("请输入1到2000之间的整数！")
+        except ValueError:
+            print("请输入有效的整数！")
+
+    while args.formats is None:
+        try:
+            args.formats = parse_formats(input(f"请输入导出格式，逗号分隔 (可选 {', '.join(EXPORTERS)}，默认 xlsx,csv): "))
+        except ValueError as e:
+            print(f"{str(e)}！")
+
+
+def until_pending(records):
+    """产出记录直到遇到第一条仍在评测的记录：追加式更新的日记里不写入之后还会变化的状态"""
+    for record in records:
+        if record.status in PENDING_STATUS:
+            return
+        yield record
+
+
+def generate_diary(store, luogu_uid, client_id, count, base_filename, formats, settled=False, archive=None,
+                   shard=None, enrich=True):
+    """补全题目信息并导出本地库中最新的count条记录，返回导出摘要；settled 为真时不导出末尾仍在评测的记录，
+    指定 archive 时同时归档源代码并在日记中链接，指定 shard（month/year）时 Excel 按时间段分片导出，
+    enrich 为假时不请求题目难度和标签
+    """
+    problems = diary_problems(luogu_uid, client_id, store, store.latest_pids(luogu_uid, count), formats, enrich)
+    sources = source_links(luogu_uid, client_id, store, archive, store.latest_ids(luogu_uid, count), base_filename)
+
+    records = store.iter_latest(luogu_uid, count)
+    if settled:
+        records = until_pending(records)
+    # 记录较多且要生成 Excel 等较慢的格式时各格式并行生成，否则从本地库逐条读出，一次遍历同时生成所有格式的文件
+    parallel = worth_parallel(formats, min(count, store.span_count(luogu_uid)))
+    return export_diary(records, base_filename, formats, parallel, problems, sources, shard)
+
+
+def generate_filtered_diary(store, luogu_uid, client_id, filters, count, base_filename, formats, cache=None,
+                            archive=None, shard=None, workers=FETCH_WORKERS, enrich=True):
+    """按筛选条件直接从洛谷获取记录并导出，返回导出摘要；有页面获取失败时不导出，返回 None
+
+    筛选得到的记录不连续，不写入本地库（否则增量同步遇到这些记录会误以为更早的记录都已同步）
+    """
+    with METRICS.phase("fetch") as stats:
+        try:
+            records = fetch_filtered_submissions(luogu_uid, client_id, filters, count, workers, cache=cache)
+        except Exception:
+            print("⚠️ 筛选结果不完整，没有生成日记，请稍后重试")
+            return None
+        stats["rows"] = len(records)
+    problems = diary_problems(luogu_uid, client_id, store, [record.pid for record in records], formats, enrich)
+    sources = source_links(luogu_uid, client_id, store, archive, [record.id for record in records], base_filename)
+    parallel = worth_parallel(formats, len(records))
+    return export_diary(records, base_filename, formats, parallel, problems, sources, shard)
+
+
+def update_diary(store, luogu_uid, client_id, count, base_filename, formats, archive=None, enrich=True):
+    """在已有日记末尾只追加新记录（保留备注列），文件不存在或不支持追加的格式生成最新的count条，返回新写入的条数；
+    已存在却无法追加的日记文件不会被覆盖
+    """
+    appenders, rebuild = open_appenders(base_filename, formats, store)
+
+    # 各文件上次更新到的记录可能不同，按最后一条记录分组，每组只读取其后的新记录
+    groups = {}
+    for appender in appenders:
+        groups.setdefault(appender.last_id, []).append(appender)
+    written = 0
+    for last_id, writers in groups.items():
+        if not store.in_span(luogu_uid, last_id):
+            # 记录不在本地库的连续区间内时，它之后的记录可能有缺口，不能直接追加
+            print(f"⚠️ 本地记录库中没有记录 {last_id} 之后的完整记录，跳过: {', '.join(writer.filename for writer in writers)}")
+            continue
+        records = list(until_pending(store.iter_after(luogu_uid, last_id)))
+        problems = diary_problems(luogu_uid, client_id, store, [record.pid for record in records], formats, enrich)
+        sources = source_links(luogu_uid, client_id, store, archive, [record.id for record in records],
+                               base_filename)
+        written = max(written, export_records(records, writers, problems, sources)["count"])
+
+    if rebuild:
+        written = max(written, generate_diary(store, luogu_uid, client_id, count, base_filename, rebuild,
+                                              settled=True, archive=archive, enrich=enrich)["count"])
+    return written
+
+
+def watch(args, cache, archive=None):
+    """监视模式：持续增量同步，日记内容有变化时才追加新记录
+
+    有新提交或仍有记录在评测时按最短间隔轮询，空闲时每次间隔翻倍，直到最长间隔
+    """
+    base_filename = args.output or f"Luogu_Diary_{args.uid}"
+    interval = args.min_interval
+    last_fingerprint = None
+    print(f"开始监视用户 {args.uid} 的提交记录（按 Ctrl+C 退出）...")
+    with SubmissionStore(args.db) as store:
+        try:
+            while True:
+                with METRICS.phase("fetch") as stats:
+                    stats["rows"] = sync_luogu_store(args.uid, args.client_id, store, args.count, cache=cache,
+                                                     workers=args.workers)
+                fingerprint = store.fingerprint(args.uid, args.count)
+                if fingerprint != last_fingerprint and store.count(args.uid):
+                    written = update_diary(store, args.uid, args.client_id, args.count, base_filename, args.formats,
+                                           archive, args.enrich)
+                    print(f"[{time.strftime('%H:%M:%S')}] 日记已更新，写入 {written} 条记录")
+                    last_fingerprint = fingerprint
+                    interval = args.min_interval
+                elif store.pending_count(args.uid, args.count):
+                    interval = args.min_interval  # 还有记录在评测，结果很快会变化
+                else:
+                    interval = min(interval * 2, args.max_interval)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\n已停止监视")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.profile:
+            with profiled(args.profile):
+                run(args)
+        else:
+            run(args)
+    finally:
+        if args.metrics:
+            METRICS.write(args.metrics)
+
+
+def run(args):
+    # 监视模式需要每次都向服务器确认（未变化时只返回很小的304响应），不能直接使用新鲜期内的缓存
+    cache = None
+    if args.cache:
+        cache = ResponseCache(CACHE_DIR, ttl=0) if args.watch else ResponseCache(CACHE_DIR)
+    archive = SourceArchive(args.source_dir) if args.sources else None
+
+    if args.batch:
+        run_batch(args.batch, args.formats or DEFAULT_FORMATS, args.workers, cache=cache, db_file=args.db,
+                  enrich=args.enrich)
+        return
+
+    # 命令行或环境变量已提供账号信息时不再询问，可用于定时任务
+    if not (args.uid and args.client_id):
+        if not sys.stdin.isatty():
+            print("错误: 非交互运行时需通过 --uid/--client-id 或环境变量 LUOGU_UID/LUOGU_CLIENT_ID 提供Cookie信息")
+            sys.exit(1)
+        prompt_args(args)
+    if args.count is None and args.filters.since is None:
+        args.count = 50  # 指定了时间窗口而没有指定数量时，获取窗口内的全部记录
+    if args.formats is None:
+        args.formats = list(DEFAULT_FORMATS)
+
+    client_id, luogu_uid, count, formats = args.client_id, args.uid, args.count, args.formats
+    if not client_id or not luogu_uid:
+        print("错误: 必须提供Cookie信息")
+        sys.exit(1)
+
+    if args.watch:
+        watch(args, cache, archive)
+        return
+
+    # 生成文件名
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    if args.filters:
+        print(f"\n正在获取用户 {luogu_uid} 符合筛选条件的提交记录...")
+        base_filename = args.output or f"Luogu_Diary_{luogu_uid}_{timestamp}"
+        with SubmissionStore(args.db) as store:
+            summary = generate_filtered_diary(store, luogu_uid, client_id, args.filters, count, base_filename,
+                                              formats, cache, archive, args.shard, args.workers, args.enrich)
+        if summary is None:
+            sys.exit(1)
+        if not summary['count']:
+            print("没有符合筛选条件的提交记录")
+            return
+    else:
+        # 获取提交记录
+        print(f"\n正在获取用户 {luogu_uid} 的最新 {count} 条提交记录...")
+        # 已同步过的记录保存在本地库中，只需请求新增的部分
+        with SubmissionStore(args.db) as store:
+            with METRICS.phase("fetch") as stats:
+                if args.backfill:
+                    try:
+                        new_count = backfill_store(luogu_uid, client_id, store, count, cache=cache,
+                                                   workers=args.workers)
+                    except KeyboardInterrupt:
+                        sys.exit(130)
+                    if new_count is None:
+                        sys.exit(1)
+                    # 回填的是开始时的快照，之后的新提交再增量同步一次（通常只需一页）
+                    stats["rows"] = new_count + sync_luogu_store(luogu_uid, client_id, store, count, cache=cache,
+                                                                 workers=args.workers)
+                else:
+                    stats["rows"] = sync_luogu_store(luogu_uid, client_id, store, count, cache=cache,
+                                                     workers=args.workers)
+
+            if not store.count(luogu_uid):
+                print("获取提交记录失败，请检查：")
+                print("1. Cookie信息是否正确（需包含__client_id和_uid）")
+                print("2. 账号是否有公开提交记录")
+                sys.exit(1)
+
+            if args.update:
+                base_filename = args.output or f"Luogu_Diary_{luogu_uid}"
+                written = update_diary(store, luogu_uid, client_id, count, base_filename, formats, archive,
+                                       args.enrich)
+                print(f"✅ 日记已更新: {base_filename}，写入 {written} 条记录")
+                return
+
+            base_filename = args.output or f"Luogu_Diary_{luogu_uid}_{timestamp}"
+            summary = generate_diary(store, luogu_uid, client_id, count, base_filename, formats, archive=archive,
+                                     shard=args.shard, enrich=args.enrich)
+
+    actual_count = summary['count']
+    if not args.filters and actual_count < count:
+        print(f"⚠️ 注意: 只获取到 {actual_count} 条记录（请求数量: {count}）")
+    else:
+        print(f"✅ 成功获取 {actual_count} 条提交记录")
+    # 显示时间范围
+    first_submit = datetime.fromtimestamp(summary['first']).strftime("%Y-%m-%d %H:%M")
+    last_submit = datetime.fromtimestamp(summary['last']).strftime("%Y-%m-%d %H:%M")
+    print(f"📅 时间范围: {first_submit} 至 {last_submit}")
+
+    # 使用提示
+    print("\n使用说明:")
+    if "xlsx" in formats and args.shard:
+        print(f"- Excel分片 ({base_filename}_<时间段>.xlsx):")
+        print(f"   - 从索引工作簿 {base_filename}_index.xlsx 打开各时间段的分片，索引中附带全部记录的统计")
+    elif "xlsx" in formats:
+        print(f"- Excel文件 ({base_filename}.xlsx):")
+        print("   - 状态颜色与洛谷官网完全一致")
+        print("   - 表格按提交时间升序排列（最早的在最上面）")
+        print("   - 附带统计概览、每日/每周提交、题目统计和资源分布工作表")
+    if "csv" in formats:
+        print(f"- CSV文件 ({base_filename}.csv):")
+        print("   - 纯文本格式，适合程序处理")
+    if set(formats) & {"csv.gz", "ndjson.gz", "parquet"}:
+        print("- 压缩/列式文件 (csv.gz / ndjson.gz / parquet):")
+        print("   - 体积小、加载快，适合数据分析程序批量读取")
+    if "summary.json" in formats:
+        print(f"- 统计摘要 ({base_filename}.summary.json):")
+        print("   - 提交次数、AC率、连续天数、各题首次AC前的提交次数和运行时间/内存分布")
+    print(f"- 包含 {actual_count} 条记录，时间从 {first_submit} 到 {last_submit}")
+    print("\n提示：避免频繁请求大量数据，以防被洛谷IPBan！")
+
+
+if __name__ == "__main__":
+    # 只检查是否已安装，不在启动时导入；openpyxl 等导出格式的可选依赖在用到时才导入，缺少时跳过对应格式
+    if importlib.util.find_spec("requests") is None:
+        print("错误: 需要安装requests库，请执行: pip install requests")
+        sys.exit(1)
+
+    main()
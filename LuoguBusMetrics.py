@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 请求耗时直方图的分桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+# 运行指标：计数器、耗时直方图和各阶段耗时，可导出为JSON摘要或Prometheus文本格式
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.phases = {}
+            self.started = time.time()
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                                     "sum": 0.0, "count": 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def add_phase(self, name, seconds, rows=None):
+        with self.lock:
+            phase = self.phases.setdefault(name, {"seconds": 0.0, "rows": 0})
+            phase["seconds"] += seconds
+            if rows:
+                phase["rows"] += rows
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个阶段的耗时；可在 with 块内设置 stats["rows"] 记录处理的行数"""
+        stats = {"rows": 0}
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            self.add_phase(name, time.perf_counter() - started, stats["rows"])
+
+    def summary(self):
+        """JSON摘要：计数器、直方图（含平均值）、各阶段耗时和行/秒"""
+        with self.lock:
+            phases = {}
+            for name, phase in self.phases.items():
+                phases[name] = dict(phase)
+                if phase["rows"] and phase["seconds"]:
+                    phases[name]["rows_per_sec"] = round(phase["rows"] / phase["seconds"], 1)
+            histograms = {}
+            for name, histogram in self.histograms.items():
+                histograms[name] = {
+                    "buckets": {("+Inf" if bound == float("inf") else str(bound)): count
+                                for bound, count in zip(histogram["buckets"], histogram["counts"])},
+                    "count": histogram["count"],
+                    "sum": round(histogram["sum"], 6),
+                    "avg": round(histogram["sum"] / histogram["count"], 6) if histogram["count"] else None,
+                }
+            return {
+                "started": int(self.started),
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "counters": dict(self.counters),
+                "histograms": histograms,
+                "phases": phases,
+            }
+
+    def prometheus(self):
+        """Prometheus 文本格式（可供 node_exporter 的 textfile collector 读取）"""
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE luogubus_{name} counter")
+                lines.append(f"luogubus_{name} {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE luogubus_{name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else bound
+                    lines.append(f'luogubus_{name}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"luogubus_{name}_sum {histogram['sum']}")
+                lines.append(f"luogubus_{name}_count {histogram['count']}")
+            if self.phases:
+                lines.append("# TYPE luogubus_phase_seconds gauge")
+                for name, phase in sorted(self.phases.items()):
+                    lines.append(f'luogubus_phase_seconds{{phase="{name}"}} {phase["seconds"]:.6f}')
+                lines.append("# TYPE luogubus_phase_rows gauge")
+                for name, phase in sorted(self.phases.items()):
+                    lines.append(f'luogubus_phase_rows{{phase="{name}"}} {phase["rows"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, prefix):
+        """写出 <prefix>.json 和 <prefix>.prom"""
+        with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        with open(f"{prefix}.prom", "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        print(f"✓ 已生成运行指标: {prefix}.json / {prefix}.prom")
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def profiled(prefix, top=25):
+    """用 cProfile 和 tracemalloc 分析整个运行过程，结果写入 <prefix>.prof 和 <prefix>.mem.txt"""
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}.mem.txt", "w", encoding="utf-8") as f:
+            f.write(f"current: {current // 1024} KB, peak: {peak // 1024} KB\n\n")
+            for stat in snapshot.statistics("lineno")[:top]:
+                f.write(f"{stat}\n")
+        print(f"✓ 已生成性能分析: {prefix}.prof / {prefix}.mem.txt")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,34 @@
+import importlib
+
+
+# 插件注册表：名称 -> 实现，实现可以直接是类/函数，也可以是 "模块名:属性名" 字符串，第一次使用时才导入对应模块
+# 这样只用到CSV导出时不会导入 openpyxl，不需要提取Cookie时也不会导入 cryptography
+class PluginRegistry:
+    def __init__(self, kind):
+        self.kind = kind
+        self.entries = {}
+
+    def register(self, name, target, **info):
+        """登记一个实现，info 中的附加信息（如文件扩展名）无需导入模块即可读取"""
+        self.entries[name] = {"target": target, "info": info}
+
+    def load(self, name):
+        """返回名称对应的实现，需要时导入模块；依赖库缺失时抛出 ImportError"""
+        entry = self.entries[name]
+        target = entry["target"]
+        if isinstance(target, str):
+            module_name, _, attribute = target.partition(":")
+            target = entry["target"] = getattr(importlib.import_module(module_name), attribute)
+        return target
+
+    def info(self, name):
+        return self.entries[name]["info"]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,202 @@
+import sys
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    import json
+
+    loads = json.loads
+
+
+# 精简的提交记录：只保留日记用到的字段，比原始JSON字典省内存得多
+class Submission:
+    __slots__ = ("id", "submit_time", "pid", "title", "status", "time", "memory", "language", "score")
+
+    def __init__(self, id, submit_time, pid, title, status, time=0, memory=0, language=None, score=None):
+        self.id = id
+        self.submit_time = submit_time
+        self.pid = pid
+        self.title = title
+        self.status = status
+        self.time = time
+        self.memory = memory
+        self.language = language
+        self.score = score
+
+    @classmethod
+    def from_json(cls, record):
+        """从 record/list 接口返回的记录字典构造；同一道题的题号和标题会被 intern，多次提交共享同一个字符串"""
+        problem = record.get('problem') or {}
+        pid = problem.get('pid')
+        title = problem.get('title')
+        return cls(
+            record['id'],
+            record['submitTime'],
+            sys.intern(pid) if pid else pid,
+            sys.intern(title) if title else title,
+            record.get('status', 0),
+            record.get('time') or 0,
+            record.get('memory') or 0,
+            record.get('language'),
+            record.get('score'),
+        )
+
+    def to_json(self):
+        """转换回 record/list 接口的字段结构"""
+        return {
+            "id": self.id,
+            "submitTime": self.submit_time,
+            "problem": {"pid": self.pid, "title": self.title},
+            "status": self.status,
+            "time": self.time,
+            "memory": self.memory,
+            "language": self.language,
+            "score": self.score,
+        }
+
+    def __repr__(self):
+        return f"Submission(id={self.id}, pid={self.pid!r}, status={self.status}, submit_time={self.submit_time})"
+
+
+# 唯一的状态表：状态码 -> (显示名称, Excel着色)，所有导出格式共用
+STATUS_TABLE = {
+    12: ("AC", "32CD32"),
+    7: ("WA", "FF0000"),
+    4: ("TLE", "191970"),
+    5: ("MLE", "191970"),
+    6: ("RE", "A020F0"),
+    2: ("CE", "DAA520"),
+    14: ("UnAccept", "FF0000"),
+    11: ("UKE", "191970"),
+    21: ("Waiting", None),
+    3: ("OLE", None),
+    1: ("Judging", None),
+}
+STATUS_NAMES = {code: name for code, (name, _) in STATUS_TABLE.items()}
+STATUS_COLORS = {name: color for name, color in STATUS_TABLE.values() if color}
+# 评测尚未结束的状态，结果之后还会变化
+PENDING_STATUS = {1, 21}
+
+def parse_statuses(text):
+    """解析状态列表：逗号分隔的状态名（不区分大小写，如 AC,WA）或状态码，返回状态码集合"""
+    codes = {name.lower(): code for code, name in STATUS_NAMES.items()}
+    statuses = set()
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if item.isdigit():
+            statuses.add(int(item))
+        elif item.lower() in codes:
+            statuses.add(codes[item.lower()])
+        else:
+            raise ValueError(f"未知的评测状态: {item}（可选: {', '.join(STATUS_NAMES.values())}）")
+    return statuses
+
+
+# 提交记录筛选条件：题号、状态、语言作为 record/list 的查询参数交给服务器筛选，时间窗口只能在本地判断
+class RecordFilter:
+    def __init__(self, since=None, until=None, statuses=None, pid=None, language=None):
+        self.since = since  # 时间窗口起点（含），时间戳
+        self.until = until  # 时间窗口终点（不含），时间戳
+        self.statuses = set(statuses) if statuses else None
+        self.pid = pid
+        self.language = language
+
+    def __bool__(self):
+        return any(value is not None for value in (self.since, self.until, self.statuses, self.pid, self.language))
+
+    def params(self):
+        """可以由服务器筛选的条件；接口一次只接受一个状态，选了多个状态时只在本地筛选"""
+        params = {}
+        if self.pid:
+            params["pid"] = self.pid
+        if self.statuses and len(self.statuses) == 1:
+            params["status"] = next(iter(self.statuses))
+        if self.language is not None:
+            params["language"] = self.language
+        return params
+
+    def matches(self, record):
+        """服务器已筛选过的条件也在本地再检查一次"""
+        return not (
+            (self.since is not None and record.submit_time < self.since)
+            or (self.until is not None and record.submit_time >= self.until)
+            or (self.statuses and record.status not in self.statuses)
+            or (self.pid and record.pid != self.pid)
+            or (self.language is not None and record.language != self.language)
+        )
+
+    def reached_end(self, records):
+        """按时间倒序的一页中已出现早于 since 的记录：更早的页面都在时间窗口之外，不需要再请求"""
+        return self.since is not None and any(record.submit_time < self.since for record in records)
+
+
+# 洛谷题目难度等级
+DIFFICULTY_NAMES = {
+    0: "暂无评定",
+    1: "入门",
+    2: "普及−",
+    3: "普及/提高−",
+    4: "普及+/提高",
+    5: "提高+/省选−",
+    6: "省选/NOI−",
+    7: "NOI/NOI+/CTSC",
+}
+
+
+# 归一化后的一行日记：时间、状态等只在这里转换一次，各导出格式直接使用
+DiaryRow = namedtuple("DiaryRow", [
+    "id", "submit_time", "submit_minute", "submit_second",
+    "pid", "title", "status", "status_code", "time", "memory", "language", "score",
+    "difficulty", "tags", "source",
+])
+
+
+@lru_cache(maxsize=65536)
+def format_minute(minute):
+    """格式化到分钟，按分钟缓存（同一分钟内的多次提交只调用一次 strftime）"""
+    return datetime.fromtimestamp(minute * 60).strftime("%Y-%m-%d %H:%M")
+
+
+def status_name(status_code):
+    """状态码转显示名称，未知状态显示为 Unknown(状态码)"""
+    return STATUS_NAMES.get(status_code) or f"Unknown({status_code})"
+
+
+def normalize_records(records, problems=None, sources=None):
+    """把 Submission 流转换为 DiaryRow 流；problems 为 {pid: (难度, [标签名, ...])}，用于补充难度和标签，
+    sources 为 {记录ID: 源代码文件路径}
+    """
+    sources = sources or {}
+    problem_columns = {}
+    for pid, (difficulty, tags) in (problems or {}).items():
+        problem_columns[pid] = (DIFFICULTY_NAMES.get(difficulty, ""), ",".join(tags))
+    no_problem = ("", "")
+
+    for record in records:
+        submit_time = record.submit_time
+        minute = format_minute(submit_time // 60)
+        difficulty, tags = problem_columns.get(record.pid, no_problem)
+        yield DiaryRow(
+            record.id,
+            submit_time,
+            minute,
+            f"{minute}:{submit_time % 60:02d}",
+            record.pid or "Unknown",
+            record.title or "Unknown",
+            status_name(record.status),
+            record.status,
+            record.time,
+            record.memory,
+            record.language,
+            record.score,
+            difficulty,
+            tags,
+            sources.get(record.id, ""),
+        )
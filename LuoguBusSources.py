@@ -0,0 +1,46 @@
+import gzip
+import hashlib
+import os
+import threading
+
+
+SOURCE_DIR = "LuoguBus_sources"
+
+
+# 源代码归档：按内容的SHA-256摘要保存为gzip文件（内容寻址），内容相同的多次提交只保存一份
+class SourceArchive:
+    def __init__(self, root=SOURCE_DIR):
+        self.root = root
+
+    def path(self, digest):
+        """摘要对应的文件路径，按摘要前两位分目录，避免单个目录下文件过多"""
+        return os.path.join(self.root, digest[:2], f"{digest}.gz")
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, source):
+        """保存一份源代码，返回摘要；已有相同内容时不再写入"""
+        data = source.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再改名，多个线程同时保存相同内容也不会留下半个文件
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(gzip.compress(data, mtime=0))
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest):
+        with gzip.open(self.path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def links(self, digests, base_filename):
+        """{记录ID: 摘要} 转换为 {记录ID: 相对日记文件所在目录的源代码文件路径}，没有源代码的记录不在结果中"""
+        start = os.path.dirname(os.path.abspath(base_filename))
+        return {
+            rid: os.path.relpath(os.path.abspath(self.path(digest)), start).replace(os.sep, "/")
+            for rid, digest in digests.items() if digest
+        }
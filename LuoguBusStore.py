@@ -0,0 +1,463 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from LuoguBusRecord import PENDING_STATUS, Submission
+
+
+# 本地库中一段中间没有缺口的记录区间：上界、下界记录的排序键 (提交时间, 记录ID)，
+# complete 表示下界已是账号最早的记录，total 为建立区间时接口报告的记录总数
+SyncSpan = namedtuple("SyncSpan", ["top", "floor", "complete", "total"])
+
+
+def record_key(record):
+    """记录在本地库中的排序键，与 ORDER BY submit_time, rid 一致"""
+    return record.submit_time, record.id
+
+
+def merge_spans(span, other):
+    """合并两段连续区间：有重叠时连成一段，否则只能保留较新的一段（两段之间有缺口）"""
+    if span is None:
+        return other
+    if other.floor > span.top:
+        return other
+    if other.top < span.floor:
+        return span
+    lower = span if span.floor <= other.floor else other
+    upper = span if span.top >= other.top else other
+    return SyncSpan(upper.top, lower.floor, lower.complete, upper.total)
+
+
+# 本地提交记录库（SQLite），以 (uid, 记录ID) 为主键
+class SubmissionStore:
+    def __init__(self, path="LuoguBus.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                uid TEXT NOT NULL,
+                rid INTEGER NOT NULL,
+                submit_time INTEGER NOT NULL,
+                pid TEXT,
+                title TEXT,
+                status INTEGER,
+                time INTEGER,
+                memory INTEGER,
+                language INTEGER,
+                score INTEGER,
+                PRIMARY KEY (uid, rid)
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_time
+            ON submissions (uid, submit_time)
+        """)
+        # 题目元数据（难度、标签）按题号缓存，所有账号共用
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS problems (
+                pid TEXT PRIMARY KEY,
+                difficulty INTEGER,
+                tags TEXT,
+                fetched_at INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL
+            )
+        """)
+        # 已归档的源代码：记录ID -> 内容摘要（没有权限查看源代码时为空字符串，不再重复请求）
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sources (
+                rid INTEGER PRIMARY KEY,
+                digest TEXT NOT NULL,
+                fetched_at INTEGER NOT NULL
+            )
+        """)
+        # 每个账号从最新记录开始连续保存的区间（见 SyncSpan），导出只读取区间内的记录，保证中间不缺记录
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                uid TEXT PRIMARY KEY,
+                top_time INTEGER NOT NULL,
+                top_rid INTEGER NOT NULL,
+                floor_time INTEGER NOT NULL,
+                floor_rid INTEGER NOT NULL,
+                complete INTEGER NOT NULL,
+                total INTEGER
+            )
+        """)
+        # 追加式日记文件上次追加后的状态：最后一条记录ID，以及追加后文件的大小和修改时间，
+        # 文件没有被改动过时下次追加直接使用，不必重新解析整个文件
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS diary_marks (
+                path TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.spans = {}  # 账号 -> SyncSpan，读取时使用的缓存
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self, uid):
+        """本地已保存的记录条数"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM submissions WHERE uid = ?", (str(uid),)
+            ).fetchone()
+        return row[0]
+
+    def sync_span(self, uid):
+        """账号的连续区间 SyncSpan，从未同步过（或是旧版本建立的库）时返回 None"""
+        uid = str(uid)
+        if uid not in self.spans:
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT top_time, top_rid, floor_time, floor_rid, complete, total FROM sync_state WHERE uid = ?",
+                    (uid,)
+                ).fetchone()
+            self.spans[uid] = row and SyncSpan(tuple(row[0:2]), tuple(row[2:4]), bool(row[4]), row[5])
+        return self.spans[uid]
+
+    def save_sync_span(self, uid, span):
+        uid = str(uid)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (uid,) + span.top + span.floor + (int(span.complete), span.total))
+            self.conn.commit()
+        self.spans[uid] = span
+
+    def span_clause(self, uid):
+        """限定在连续区间内的 SQL 条件和参数；没有区间（旧版本的库）时不限定"""
+        span = self.sync_span(uid)
+        if span is None:
+            return "", []
+        return ("AND (submit_time, rid) >= (?, ?) AND (submit_time, rid) <= (?, ?)",
+                list(span.floor) + list(span.top))
+
+    def span_count(self, uid):
+        """连续区间内的记录条数"""
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT COUNT(*) FROM submissions WHERE uid = ? {clause}", [str(uid)] + params
+            ).fetchone()
+        return row[0]
+
+    def in_span(self, uid, rid):
+        """记录 rid 是否在本地库中且位于连续区间内（其后的记录都没有缺口）"""
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT 1 FROM submissions WHERE uid = ? AND rid = ? {clause}", [str(uid), rid] + params
+            ).fetchone()
+        return row is not None
+
+    def diary_mark(self, path):
+        """日记文件上次追加后的 (最后一条记录ID, 文件大小, 修改时间ns)，没有时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_id, size, mtime_ns FROM diary_marks WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return row and tuple(row)
+
+    def save_diary_mark(self, path, last_id):
+        """记录日记文件追加完成后的状态（在文件关闭后调用）"""
+        stat = os.stat(path)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO diary_marks VALUES (?, ?, ?, ?)",
+                              (os.path.abspath(path), last_id, stat.st_size, stat.st_mtime_ns))
+            self.conn.commit()
+
+    def known_ids(self, uid, rids):
+        """返回 rids 中已存在于本地库的记录ID集合"""
+        rids = list(rids)
+        if not rids:
+            return set()
+        placeholders = ",".join("?" * len(rids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT rid FROM submissions WHERE uid = ? AND rid IN ({placeholders})",
+                [str(uid)] + rids
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_records(self, uid, records):
+        """保存一批 Submission，已存在的记录会被覆盖（评测状态可能更新），返回写入条数"""
+        rows = [
+            (str(uid), record.id, record.submit_time, record.pid, record.title, record.status,
+             record.time, record.memory, record.language, record.score)
+            for record in records
+        ]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO submissions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+        return len(rows)
+
+    def fingerprint(self, uid, count):
+        """最新 count 条记录的摘要（记录ID、状态、分数），用于判断日记内容是否有变化"""
+        digest = hashlib.sha1()
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            rows = self.conn.execute(f"""
+                SELECT rid, status, score FROM submissions WHERE uid = ? {clause}
+                ORDER BY submit_time DESC, rid DESC LIMIT ?
+            """, [str(uid)] + params + [count]).fetchall()
+        for row in rows:
+            digest.update(repr(row).encode("ascii"))
+        return digest.hexdigest()
+
+    def pending_count(self, uid, count):
+        """最新 count 条记录中仍在评测的条数"""
+        placeholders = ",".join("?" * len(PENDING_STATUS))
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            row = self.conn.execute(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT status FROM submissions WHERE uid = ? {clause}
+                    ORDER BY submit_time DESC, rid DESC LIMIT ?
+                ) WHERE status IN ({placeholders})
+            """, [str(uid)] + params + [count] + sorted(PENDING_STATUS)).fetchone()
+        return row[0]
+
+    def latest_pids(self, uid, count):
+        """最新的 count 条记录中出现过的题号（去重）"""
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            rows = self.conn.execute(f"""
+                SELECT DISTINCT pid FROM (
+                    SELECT pid FROM submissions WHERE uid = ? {clause}
+                    ORDER BY submit_time DESC, rid DESC LIMIT ?
+                ) WHERE pid IS NOT NULL
+            """, [str(uid)] + params + [count]).fetchall()
+        return [row[0] for row in rows]
+
+    def latest_ids(self, uid, count):
+        """最新的 count 条记录的记录ID"""
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            rows = self.conn.execute(f"""
+                SELECT rid FROM submissions WHERE uid = ? {clause}
+                ORDER BY submit_time DESC, rid DESC LIMIT ?
+            """, [str(uid)] + params + [count]).fetchall()
+        return [row[0] for row in rows]
+
+    def source_digests(self, rids):
+        """返回 {记录ID: 源代码摘要}，还没有归档的记录不在结果中"""
+        rids = list(dict.fromkeys(rids))
+        digests = {}
+        for start in range(0, len(rids), 500):
+            chunk = rids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT rid, digest FROM sources WHERE rid IN ({placeholders})", chunk
+                ).fetchall()
+            digests.update(rows)
+        return digests
+
+    def save_sources(self, digests):
+        """保存一批源代码摘要：[(rid, digest), ...]"""
+        now = int(time.time())
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                                  [(rid, digest, now) for rid, digest in digests])
+            self.conn.commit()
+
+    def stale_problems(self, pids, ttl):
+        """pids 中本地没有元数据或元数据已超过 ttl 秒的题号"""
+        pids = list(dict.fromkeys(pids))
+        fresh = set()
+        deadline = int(time.time() - ttl)
+        for start in range(0, len(pids), 500):
+            chunk = pids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT pid FROM problems WHERE fetched_at >= ? AND pid IN ({placeholders})",
+                    [deadline] + chunk
+                ).fetchall()
+            fresh.update(row[0] for row in rows)
+        return [pid for pid in pids if pid not in fresh]
+
+    def save_problems(self, problems):
+        """保存一批题目元数据：[(pid, difficulty, [tag_id, ...]), ...]"""
+        now = int(time.time())
+        rows = [(pid, difficulty, json.dumps(tags or []), now) for pid, difficulty, tags in problems]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO problems VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def save_tag_names(self, names):
+        """保存标签名称：{tag_id: name}"""
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO tags VALUES (?, ?)", list(names.items()))
+            self.conn.commit()
+
+    def tag_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+
+    def problem_meta(self, pids):
+        """返回 {pid: (difficulty, [标签名, ...])}，没有元数据的题号不在结果中"""
+        with self.lock:
+            tag_names = dict(self.conn.execute("SELECT id, name FROM tags").fetchall())
+        pids = list(dict.fromkeys(pids))
+        meta = {}
+        for start in range(0, len(pids), 500):
+            chunk = pids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT pid, difficulty, tags FROM problems WHERE pid IN ({placeholders})", chunk
+                ).fetchall()
+            for pid, difficulty, tags in rows:
+                meta[pid] = (difficulty, [tag_names[tag] for tag in json.loads(tags) if tag in tag_names])
+        return meta
+
+    def latest(self, uid, count):
+        """取出最新的 count 条记录，按提交时间升序返回；只取连续区间内的记录，区间不足 count 条时返回的更少"""
+        return list(self.iter_latest(uid, count))
+
+    def iter_latest(self, uid, count, batch_size=1000):
+        """latest 的流式版本：按提交时间升序逐条产出，每次只从数据库读取 batch_size 行"""
+        skip = max(0, self.span_count(uid) - count)
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            cursor = self.conn.execute(f"""
+                SELECT rid, submit_time, pid, title, status, time, memory, language, score
+                FROM submissions WHERE uid = ? {clause}
+                ORDER BY submit_time, rid LIMIT -1 OFFSET ?
+            """, [str(uid)] + params + [skip])
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield self.row_to_record(row)
+
+    def iter_after(self, uid, rid, batch_size=1000):
+        """按提交时间排在记录 rid 之后的记录，升序逐条产出；只读取这部分新记录"""
+        clause, params = self.span_clause(uid)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT submit_time FROM submissions WHERE uid = ? AND rid = ?", (str(uid), rid)
+            ).fetchone()
+            if row is None:
+                return
+            cursor = self.conn.execute(f"""
+                SELECT rid, submit_time, pid, title, status, time, memory, language, score
+                FROM submissions WHERE uid = ? AND (submit_time > ? OR (submit_time = ? AND rid > ?)) {clause}
+                ORDER BY submit_time, rid
+            """, [str(uid), row[0], row[0], rid] + params)
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield self.row_to_record(row)
+
+    @staticmethod
+    def row_to_record(row):
+        """数据库行转换为 Submission"""
+        rid, submit_time, pid, title, status, run_time, memory, language, score = row
+        return Submission(
+            rid, submit_time,
+            sys.intern(pid) if pid else pid,
+            sys.intern(title) if title else title,
+            status, run_time, memory, language, score
+        )
+
+
+# 回填检查点：追加写入的NDJSON文件，第一行是抓取计划，之后每行是一页已完成的记录（含该页响应中的记录总数）
+# 每页写完立即落盘，中断（封禁、超时、Ctrl+C）后再次运行可以跳过已完成的页面
+class BackfillCheckpoint:
+    def __init__(self, path):
+        self.path = path
+        self.plan = None
+        self.file = None
+        self.valid_size = 0  # 完整写入的字节数，中断时写了一半的行在继续写入前截掉
+        self.lock = threading.Lock()
+
+    def load(self):
+        """读取检查点，返回 (计划, [(页码, 记录总数, [Submission, ...]), ...])；没有检查点时计划为 None"""
+        self.plan = None
+        self.valid_size = 0
+        entries = []
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if "plan" in entry:
+                        self.plan = entry["plan"]
+                        entries = []
+                    else:
+                        entries.append((entry["page"], entry["count"],
+                                        [Submission.from_json(record) for record in entry["records"]]))
+                    self.valid_size += len(line)
+        except FileNotFoundError:
+            pass
+        return self.plan, entries
+
+    def start(self, plan):
+        """开始新的回填：丢弃旧检查点，写入计划"""
+        self.clear()
+        self.plan = plan
+        self.append({"plan": plan})
+
+    def save_page(self, page, count, records):
+        self.append({"page": page, "count": count, "records": [record.to_json() for record in records]})
+
+    def append(self, entry):
+        data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "ab")
+                self.file.truncate(self.valid_size)
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.valid_size += len(data)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def clear(self):
+        """回填完成后删除检查点"""
+        self.close()
+        self.plan = None
+        self.valid_size = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass